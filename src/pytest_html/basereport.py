@@ -1,21 +1,75 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import base64
 import datetime
 import json
 import math
 import os
 import re
+import threading
 import time
 import warnings
+import zlib
 from collections import defaultdict
+from functools import partial
 from html import escape
+from html import unescape
 from pathlib import Path
 
 import pytest
 
 from pytest_html import __version__
 from pytest_html import extras
+from pytest_html.cells import Cell
+from pytest_html.report_data import _serialize
+from pytest_html.report_data import ResultRecord
+from pytest_html.util import _remove_ansi
+
+
+# the most finished tests that wait to be passed to the batch hooks at once
+_FINISHED_TESTS_BATCH = 100
+
+# escaped characters and ANSI escape sequences, which logs are not cut in
+_UNCUTTABLE = re.compile(r"&#?\w+;|\x1b\[[\d;]*[A-Za-z]")
+
+
+class _ReportWriter(threading.Thread):
+    """Regenerates the report in the background, at most once per interval."""
+
+    def __init__(self, generate, interval):
+        super().__init__(name="pytest-html-report-writer", daemon=True)
+        self._generate = generate
+        self._interval = interval
+        self._requested = threading.Event()
+        self._stopped = threading.Event()
+        self._errors = []
+
+    def request(self):
+        self._requested.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._requested.set()
+        self.join()
+        for error in self._errors:
+            warnings.warn(
+                f"Failed to write the html report in the background: {error!r}"
+            )
+
+    def run(self):
+        while True:
+            self._requested.wait()
+            if self._stopped.is_set():
+                return
+            # requests made while writing are coalesced into the next write
+            self._requested.clear()
+            try:
+                self._generate()
+            except Exception as error:
+                # a failed write must not stop the following ones
+                self._errors.append(error)
+            self._stopped.wait(self._interval)
 
 
 class BaseReport:
@@ -26,14 +80,49 @@ class BaseReport:
         self._report_path.parent.mkdir(parents=True, exist_ok=True)
         self._config = config
         self._template = template
+        self._skeleton = None
+        self._static_context = {}
         self._css = css
         self._max_asset_filename_length = int(
             config.getini("max_asset_filename_length")
         )
-
-        self._reports = defaultdict(dict)
+        self._max_inline_log_size = int(config.getini("max_inline_log_size"))
+        self._process_passed = config.getini("process_passed_setup_teardown")
+
+        self._compress_data = config.getini("compress_report_data")
+        self._columnar_data = config.getini("columnar_report_data")
+        self._live_report = config.getini("generate_report_on_test")
+        self._live_data_path = None
+        if self._live_report and config.getini("incremental_live_report"):
+            self._live_data_path = self._report_path.with_suffix(".live.js")
+
+        self._report_writer = None
+        interval = _parse_interval(config.getini("generate_report_interval"))
+        if self._live_report and not self._live_data_path and interval > 0:
+            self._report_writer = _ReportWriter(self._generate_report, interval)
+        # guards the report data against concurrent reads by the report writer
+        self._lock = threading.Lock()
+
+        self._generated_revision = None
+        self._implemented_hooks = {}
+        self._reports = defaultdict(list)
+        self._finished_tests = []
+        self._sortable_columns = []
         self._report = report_data
         self._report.title = self._report_path.name
+        if config.getini("journal_report_data"):
+            self._report.journal_results(
+                self._report_path.with_suffix(".results.jsonl")
+            )
+        self._timings = report_data.timings
+        self._timings_path = None
+        if config.getini("report_timings_file"):
+            self._timings_path = (
+                Path.cwd()
+                / Path(
+                    os.path.expandvars(config.getini("report_timings_file"))
+                ).expanduser()
+            )
         self._suite_start_time = time.time()
 
     @property
@@ -49,26 +138,102 @@ class BaseReport:
             file_extension,
         )[-self._max_asset_filename_length :]
 
-    def _generate_report(self, self_contained=False):
+    def _generate_report(self, self_contained=False, live_data=None):
         generated = datetime.datetime.now()
-        test_data = self._report.data
-        test_data = json.dumps(test_data)
-        rendered_report = self._template.render(
-            title=self._report.title,
-            date=generated.strftime("%d-%b-%Y"),
-            time=generated.strftime("%H:%M:%S"),
-            version=__version__,
-            styles=self.css,
-            run_count=self._run_count(),
-            running_state=self._report.running_state,
-            self_contained=self_contained,
-            outcomes=self._report.outcomes,
-            test_data=test_data,
-            table_head=self._report.table_header,
-            additional_summary=self._report.additional_summary,
+        with self._lock:
+            # Nothing but the time of generation would change in a report
+            # generated from the same data, so it is not written again.
+            revision = (self._report.revision, live_data)
+            if revision == self._generated_revision:
+                return
+            test_data = {
+                **self._report.data,
+                "tests": self._report.data["tests"].snapshot(),
+            }
+            outcomes = {
+                outcome: dict(values)
+                for outcome, values in self._report.outcomes.items()
+            }
+            run_count = self._run_count()
+            running_state = self._report.running_state
+
+        test_data = self._prepare_test_data(test_data)
+        if self._columnar_data:
+            test_data = {
+                **test_data,
+                "tests": {},
+                "columnar": _encode_columnar(test_data["tests"]),
+            }
+        test_data = _iter_json(test_data)
+        if self._compress_data:
+            test_data = _gzip_base64(test_data)
+        else:
+            test_data = _escape_script_data(test_data)
+        test_data = self._timings.measure_iter("serialize", test_data)
+
+        if self._skeleton is None:
+            self._skeleton = self._render_skeleton(self_contained)
+
+        context = self._template.new_context(
+            {
+                **self._static_context,
+                "date": generated.strftime("%d-%b-%Y"),
+                "time": generated.strftime("%H:%M:%S"),
+                "run_count": run_count,
+                "running_state": running_state,
+                "outcomes": outcomes,
+                "test_data": test_data,
+                "data_encoding": "gzip" if self._compress_data else None,
+                "live_data": live_data,
+                "additional_summary": self._report.additional_summary,
+            }
         )
 
-        self._write_report(rendered_report)
+        rendered_report = self._render_report(context)
+        self._write_report(self._timings.measure_iter("render", rendered_report))
+        self._generated_revision = revision
+
+    def _render_skeleton(self, self_contained):
+        # Everything outside of the dynamic template blocks stays the same
+        # during a run, so it is rendered only once, with placeholders for
+        # the blocks, which are then rendered on every report generation.
+        self._static_context = {
+            "title": self._report.title,
+            "version": __version__,
+            "styles": self.css,
+            "self_contained": self_contained,
+            "table_head": self._report.table_header,
+        }
+        context = self._template.new_context(self._static_context)
+        for name in self._template.blocks:
+            context.blocks[name] = [partial(_block_placeholder, name)]
+
+        skeleton = "".join(self._template.root_render_func(context))
+        return re.split(r"\x00(\w+)\x00", skeleton)
+
+    def _render_report(self, context):
+        for index, part in enumerate(self._skeleton):
+            if index % 2:
+                yield from self._template.blocks[part](context)
+            else:
+                yield part
+
+    def _prepare_test_data(self, test_data):
+        return test_data
+
+    def _generate_live_report(self):
+        # Write the report shell, containing all results so far, and start
+        # a fresh sidecar file that finished tests are appended to.
+        self._generate_report(live_data=self._live_data_path.name)
+        self._live_data_path.write_text("", encoding="utf-8")
+
+    def _append_live_data(self, nodeid, tests):
+        if not tests:
+            return
+
+        entry = json.dumps([nodeid, tests], default=_serialize)
+        with self._live_data_path.open("a", encoding="utf-8") as f:
+            f.write(f"pytestHtmlLive.push({entry});\n")
 
     def _generate_environment(self):
         try:
@@ -105,9 +270,13 @@ class BaseReport:
     def _media_content(self, *args, **kwargs):
         pass
 
+    def _wait_for_assets(self):
+        pass
+
     def _process_extras(self, report, test_id):
         test_index = hasattr(report, "rerun") and report.rerun + 1 or 0
         report_extras = getattr(report, "extras", [])
+        processed_extras = []
         for extra_index, extra in enumerate(report_extras):
             content = extra["content"]
             asset_name = self._asset_filename(
@@ -117,28 +286,66 @@ class BaseReport:
                 extra["extension"],
             )
             if extra["format_type"] == extras.FORMAT_JSON:
-                content = json.dumps(content)
-                extra["content"] = self._data_content(
-                    content, asset_name=asset_name, mime_type=extra["mime_type"]
+                content = self._data_content(
+                    json.dumps(content),
+                    asset_name=asset_name,
+                    mime_type=extra["mime_type"],
                 )
 
             if extra["format_type"] == extras.FORMAT_TEXT:
                 if isinstance(content, bytes):
                     content = content.decode("utf-8")
-                extra["content"] = self._data_content(
+                content = self._data_content(
                     content, asset_name=asset_name, mime_type=extra["mime_type"]
                 )
 
             if extra["format_type"] in [extras.FORMAT_IMAGE, extras.FORMAT_VIDEO]:
-                extra["content"] = self._media_content(
+                content = self._media_content(
                     content, asset_name=asset_name, mime_type=extra["mime_type"]
                 )
 
-        return report_extras
+            # The same extra can be added to several reports, e.g. to every
+            # attempt of a rerun test, so it is copied rather than modified.
+            processed_extras.append({**extra, "content": content})
+
+        return processed_extras
+
+    def _limit_log(self, logs, report, test_id):
+        log = "\n".join(logs)
+        if len(log) <= self._max_inline_log_size:
+            return logs, None
+
+        test_index = hasattr(report, "rerun") and report.rerun + 1 or 0
+        asset_name = self._asset_filename(
+            test_id.encode("utf-8").decode("unicode_escape"), "log", test_index, "txt"
+        )
+        # the log is already escaped for the report
+        full_log = self._data_content(
+            unescape(_remove_ansi(log)), asset_name=asset_name, mime_type="text/plain"
+        )
+
+        head, tail = _truncate_log(log, self._max_inline_log_size)
+        omitted = len(log) - len(head) - len(tail)
+        return [head, f"[{omitted} characters omitted]\n", tail], full_log
+
+    def _hook_implemented(self, name):
+        # Most of the hooks are called for every result, but implemented by
+        # few plugins, so whether a hook is implemented is looked up once.
+        implemented = self._implemented_hooks.get(name)
+        if implemented is None:
+            hook = getattr(self._config.hook, name)
+            implemented = self._implemented_hooks[name] = bool(hook.get_hookimpls())
+        return implemented
+
+    def _call_hook(self, name, **kwargs):
+        if not self._hook_implemented(name):
+            return []
+        # third-party hook implementations count towards the report overhead
+        with self._timings.measure(name):
+            return getattr(self._config.hook, name)(**kwargs)
 
     def _write_report(self, rendered_report):
-        with self._report_path.open("w", encoding="utf-8") as f:
-            f.write(rendered_report)
+        _write_atomic(self._report_path, rendered_report, self._timings)
 
     def _run_count(self):
         relevant_outcomes = ["passed", "failed", "xpassed", "xfailed"]
@@ -156,31 +363,57 @@ class BaseReport:
         return f"{counts}/{self._report.collected_items} {'tests' if plural else 'test'} done."
 
     def _hydrate_data(self, data, cells):
-        for index, cell in enumerate(cells):
-            # extract column name and data if column is sortable
-            if "sortable" in self._report.table_header[index]:
-                name_match = re.search(r"col-(\w+)", cell)
-                data_match = re.search(r"<td.*?>(.*?)</td>", cell)
-                if name_match and data_match:
-                    data[name_match.group(1)] = data_match.group(1)
+        for index in self._sortable_columns:
+            if index >= len(cells):
+                break
+            cell = cells[index]
+            if isinstance(cell, Cell):
+                data[cell.column] = cell.sort_key
+                continue
+
+            # extract column name and data from plain HTML cells
+            name_match = re.search(r"col-(\w+)", cell)
+            data_match = re.search(r"<td.*?>(.*?)</td>", cell)
+            if name_match and data_match:
+                data[name_match.group(1)] = data_match.group(1)
+
+    def pytest_plugin_registered(self, plugin, manager):
+        # plugins registered later on, e.g. conftest files of subdirectories,
+        # may implement hooks that were not implemented before
+        self._implemented_hooks.clear()
 
     @pytest.hookimpl(trylast=True)
     def pytest_sessionstart(self, session):
         self._report.set_data("environment", self._generate_environment())
 
-        session.config.hook.pytest_html_report_title(report=self._report)
+        self._call_hook("pytest_html_report_title", report=self._report)
 
         headers = self._report.table_header
-        session.config.hook.pytest_html_results_table_header(cells=headers)
+        self._call_hook("pytest_html_results_table_header", cells=headers)
         self._report.table_header = _fix_py(headers)
+        self._sortable_columns = [
+            index
+            for index, header in enumerate(self._report.table_header)
+            if "sortable" in header
+        ]
 
         self._report.running_state = "started"
-        if self._config.getini("generate_report_on_test"):
+        if self._live_data_path:
+            self._generate_live_report()
+        elif self._report_writer:
+            self._report_writer.start()
+            self._report_writer.request()
+        elif self._live_report:
             self._generate_report()
 
     @pytest.hookimpl(trylast=True)
     def pytest_sessionfinish(self, session):
-        session.config.hook.pytest_html_results_summary(
+        self._process_finished_tests()
+        if self._report_writer:
+            self._report_writer.stop()
+
+        self._call_hook(
+            "pytest_html_results_summary",
             prefix=self._report.additional_summary["prefix"],
             summary=self._report.additional_summary["summary"],
             postfix=self._report.additional_summary["postfix"],
@@ -189,10 +422,34 @@ class BaseReport:
         self._report.running_state = "finished"
         suite_stop_time = time.time()
         self._report.total_duration = suite_stop_time - self._suite_start_time
+        self._wait_for_assets()
         self._generate_report()
+        self._report.close_results()
+        if self._live_data_path:
+            # an open report reloads itself once the sidecar disappears
+            self._live_data_path.unlink(missing_ok=True)
+
+        if self._timings_path:
+            totals = self._timings.totals
+            self._timings_path.parent.mkdir(parents=True, exist_ok=True)
+            self._timings_path.write_text(
+                json.dumps({"total": sum(totals.values()), "phases": totals}),
+                encoding="utf-8",
+            )
 
     @pytest.hookimpl(trylast=True)
     def pytest_terminal_summary(self, terminalreporter):
+        if self._config.getini("report_timings"):
+            totals = self._timings.totals
+            phases = ", ".join(
+                f"{phase} {duration:.3f}s"
+                for phase, duration in sorted(
+                    totals.items(), key=lambda item: item[1], reverse=True
+                )
+            )
+            terminalreporter.write_line(
+                f"pytest-html overhead: {sum(totals.values()):.3f}s ({phases})"
+            )
         terminalreporter.write_sep(
             "-",
             f"Generated html report: {self._report_path.as_uri()}",
@@ -201,11 +458,17 @@ class BaseReport:
     @pytest.hookimpl(trylast=True)
     def pytest_collectreport(self, report):
         if report.failed:
-            self._process_report(report, 0, [])
+            rows = self._process_reports([report], [0], [])
+            self._finished_tests.append((report.nodeid, [rows], True))
+            self._process_finished_tests()
 
     @pytest.hookimpl(trylast=True)
     def pytest_collection_finish(self, session):
-        self._report.collected_items = len(session.items)
+        with self._lock:
+            self._report.collected_items = len(session.items)
+        if self._live_data_path:
+            # re-write the shell now that the number of tests is known
+            self._generate_live_report()
 
     @pytest.hookimpl(trylast=True)
     def pytest_runtest_logreport(self, report):
@@ -216,92 +479,186 @@ class BaseReport:
                 DeprecationWarning,
             )
 
-        # "reruns" makes this code a mess.
-        # We store each combination of when and outcome
-        # exactly once, unless that outcome is a "rerun"
-        # then we store all of them.
-        key = (report.when, report.outcome)
-        if report.outcome == "rerun":
-            if key not in self._reports[report.nodeid]:
-                self._reports[report.nodeid][key] = list()
-            self._reports[report.nodeid][key].append(report)
-        else:
-            self._reports[report.nodeid][key] = [report]
+        # A test is run more than once when it is rerun, e.g. by
+        # pytest-rerunfailures, so its reports are grouped by attempt.
+        # Every attempt starts with a "setup". Current versions of
+        # pytest-rerunfailures also report the "teardown" of every
+        # attempt, older ones only that of the last attempt.
+        attempts = self._reports[report.nodeid]
+        if report.when == "setup" or not attempts:
+            attempts.append([])
+        attempts[-1].append(report)
 
         finished = report.when == "teardown" and report.outcome != "rerun"
         if not finished:
             return
 
-        # Calculate total duration for a single test.
-        # This is needed to add the "teardown" duration
-        # to tests total duration.
-        test_duration = 0
-        for key, reports in self._reports[report.nodeid].items():
-            _, outcome = key
-            if outcome != "rerun":
-                test_duration += reports[0].duration
-
+        processed_attempts = [self._process_attempt(each) for each in attempts]
+        # more attempts follow an attempt that is rerun
+        final = not any(each.outcome == "rerun" for each in attempts[-1])
+        self._finished_tests.append((report.nodeid, processed_attempts, final))
+        # only the processed rows are needed from here on
+        del self._reports[report.nodeid]
+
+        # The batch hooks are called with the rows of many tests at once,
+        # so finished tests wait for them only when they are implemented.
+        if (
+            self._live_report
+            or len(self._finished_tests) >= _FINISHED_TESTS_BATCH
+            or not self._batch_hooks_implemented()
+        ):
+            self._process_finished_tests()
+
+    def _batch_hooks_implemented(self):
+        return self._hook_implemented(
+            "pytest_html_results_table_row_batch"
+        ) or self._hook_implemented("pytest_html_results_table_html_batch")
+
+    def _process_attempt(self, reports):
         processed_extras = []
-        for key, reports in self._reports[report.nodeid].items():
-            when, _ = key
-            for each in reports:
-                test_id = report.nodeid
-                if when != "call":
-                    test_id += f"::{when}"
-                processed_extras += self._process_extras(each, test_id)
-
-        for key, reports in self._reports[report.nodeid].items():
-            when, _ = key
-            for each in reports:
-                dur = test_duration if when == "call" else each.duration
-                self._process_report(each, dur, processed_extras)
-
-        if self._config.getini("generate_report_on_test"):
-            self._generate_report()
-
-    def _process_report(self, report, duration, processed_extras):
-        outcome = _process_outcome(report)
-        try:
-            # hook returns as list for some reason
-            formatted_duration = self._config.hook.pytest_html_duration_format(
-                duration=duration
-            )[0]
-        except IndexError:
-            formatted_duration = _format_duration(duration)
-
-        test_id = report.nodeid
-        if report.when != "call":
-            test_id += f"::{report.when}"
-
-        data = {
-            "extras": processed_extras,
-        }
-
-        links = [
-            extra
-            for extra in data["extras"]
-            if extra["format_type"] in ["json", "text", "url"]
+        for report in reports:
+            with self._timings.measure("extras"):
+                processed_extras += self._process_extras(report, _test_id(report))
+
+        # "setup" and "teardown" add to the duration of the test
+        test_duration = sum(report.duration for report in reports)
+
+        # passed "setup" and "teardown" are not added to the html,
+        # only their duration and teardown log are used
+        shown = [
+            report
+            for report in reports
+            if report.when == "call"
+            or report.outcome != "passed"
+            or self._process_passed
         ]
-        cells = [
-            f'<td class="col-result">{outcome}</td>',
-            f'<td class="col-testId">{test_id}</td>',
-            f'<td class="col-duration">{formatted_duration}</td>',
-            f'<td class="col-links">{_process_links(links)}</td>',
+        durations = [
+            test_duration if report.when == "call" else report.duration
+            for report in shown
+        ]
+        teardown = reports[-1] if reports[-1].when == "teardown" else None
+        return self._process_reports(shown, durations, processed_extras, teardown)
+
+    def _process_reports(self, reports, durations, processed_extras, teardown=None):
+        """Build the rows of the reports and call the hooks for each row.
+
+        Returns the report, cells, logs and full log of each row, with no
+        logs for the rows that were removed from the table.
+        """
+        # regardless of pass or fail the teardown log is added to the log
+        # of the test, i.e. of the last row before the teardown
+        log_index = None
+        if teardown:
+            log_index = max(
+                (i for i, report in enumerate(reports) if report.when != "teardown"),
+                default=None,
+            )
+        links = _links(processed_extras)
+        rows = [
+            self._build_row(report, duration, links)
+            for report, duration in zip(reports, durations)
         ]
-        self._config.hook.pytest_html_results_table_row(report=report, cells=cells)
-        if not cells:
+        for report, cells in zip(reports, rows):
+            self._call_hook("pytest_html_results_table_row", report=report, cells=cells)
+
+        processed = []
+        for index, (report, cells) in enumerate(zip(reports, rows)):
+            if not cells:
+                processed.append((report, cells, processed_extras, None, None))
+                continue
+
+            full_log = None
+            if self._report.retains_log(_process_outcome(report)):
+                with self._timings.measure("logs"):
+                    processed_logs = _process_logs(report)
+                    if index == log_index:
+                        processed_logs[-1] += _process_teardown_log(teardown)
+                # limited together with the teardown log, before the hooks, which may add HTML to the logs
+                if self._max_inline_log_size:
+                    processed_logs, full_log = self._limit_log(
+                        processed_logs, report, _test_id(report)
+                    )
+            else:
+                processed_logs = ["Log output not retained for this outcome."]
+            self._call_hook(
+                "pytest_html_results_table_html", report=report, data=processed_logs
+            )
+            processed.append(
+                (report, cells, processed_extras, processed_logs, full_log)
+            )
+        return processed
+
+    def _process_finished_tests(self):
+        finished_tests, self._finished_tests = self._finished_tests, []
+        if not finished_tests:
             return
 
-        cells = _fix_py(cells)
-        self._hydrate_data(data, cells)
-        data["resultsTableRow"] = cells
+        rows = [
+            row
+            for _, attempts, _ in finished_tests
+            for attempt_rows in attempts
+            for row in attempt_rows
+        ]
+        if rows:
+            self._call_hook(
+                "pytest_html_results_table_row_batch",
+                reports=[report for report, *_ in rows],
+                rows=[cells for _, cells, *_ in rows],
+            )
+        # the batch hook may remove rows from the table as well
+        shown = [row for row in rows if row[1] and row[3] is not None]
+        if shown:
+            self._call_hook(
+                "pytest_html_results_table_html_batch",
+                reports=[report for report, *_ in shown],
+                data=[logs for _, _, _, logs, _ in shown],
+            )
+
+        live_data = []
+        with self._lock:
+            for nodeid, attempts, final in finished_tests:
+                for attempt_rows in attempts:
+                    for report, cells, processed_extras, logs, full_log in attempt_rows:
+                        if cells and logs is not None:
+                            self._add_test(
+                                report, cells, processed_extras, logs, full_log
+                            )
+                live_data.append((nodeid, self._report.finish_test(nodeid, final)))
+
+        if self._live_data_path:
+            for nodeid, tests in live_data:
+                self._append_live_data(nodeid, tests)
+        elif self._report_writer:
+            self._report_writer.request()
+        elif self._live_report:
+            self._generate_report()
 
-        processed_logs = _process_logs(report)
-        self._config.hook.pytest_html_results_table_html(
-            report=report, data=processed_logs
+    def _add_test(self, report, cells, processed_extras, logs, full_log):
+        cells = _fix_py(cells)
+        columns = {}
+        self._hydrate_data(columns, cells)
+        outcome = _process_outcome(report)
+        result = ResultRecord(outcome, processed_extras, cells, columns)
+        result.full_log = full_log
+        self._report.add_test(result, report, outcome, logs)
+
+    def _build_row(self, report, duration, links):
+        # hook returns as list for some reason
+        formatted_durations = self._call_hook(
+            "pytest_html_duration_format", duration=duration
         )
+        if formatted_durations:
+            formatted_duration = formatted_durations[0]
+        else:
+            formatted_duration = _format_duration(duration)
 
-        self._report.add_test(data, report, outcome, processed_logs)
+        return [
+            Cell("result", _process_outcome(report)),
+            Cell("testId", _test_id(report)),
+            # the formatted duration is only displayed, sorting uses the seconds
+            Cell("duration", formatted_duration, sort_key=duration),
+            Cell("links", links, renderer=_process_links),
+        ]
 
 
 def _format_duration(duration):
@@ -317,6 +674,150 @@ def _format_duration(duration):
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
 
+def _block_placeholder(name, context):
+    yield f"\x00{name}\x00"
+
+
+def _iter_json(data):
+    # Serialize the report data one test (or column) at a time, so the
+    # whole payload never has to be held in memory as a single string.
+    yield "{"
+    for index, (key, value) in enumerate(data.items()):
+        yield f"{', ' if index else ''}{json.dumps(key)}: "
+        if key == "tests":
+            yield from _iter_json_object(value)
+        elif key == "columnar":
+            yield from _iter_json_object(value, depth=2)
+        else:
+            yield json.dumps(value)
+    yield "}"
+
+
+def _iter_json_object(items, depth=1):
+    yield "{"
+    for index, (key, value) in enumerate(items.items()):
+        yield f"{', ' if index else ''}{json.dumps(key)}: "
+        if depth > 1 and isinstance(value, dict):
+            yield from _iter_json_object(value, depth - 1)
+        else:
+            yield json.dumps(value, default=_serialize)
+    yield "}"
+
+
+def _encode_columnar(tests):
+    # Lay the results out as parallel arrays, one per field and one per
+    # table cell position, instead of repeating the keys for every result.
+    rows = 0
+    fields = {}
+    missing = defaultdict(list)
+    cells = []
+    for nodeid, results in tests.items():
+        for result in results:
+            data = {"nodeid": nodeid, **_serialize(result)}
+            for position, cell in enumerate(data.pop("resultsTableRow")):
+                if position == len(cells):
+                    cells.append([None] * rows)
+                cells[position].append(cell)
+            for key, value in data.items():
+                if key not in fields:
+                    fields[key] = [None] * rows
+                    missing[key].extend(range(rows))
+                fields[key].append(value)
+            rows += 1
+            # not every result has every field or cell
+            for key, values in fields.items():
+                if len(values) < rows:
+                    values.append(None)
+                    missing[key].append(rows - 1)
+            for values in cells:
+                if len(values) < rows:
+                    values.append(None)
+
+    return {
+        "rows": rows,
+        "fields": {
+            key: _encode_field(values, missing[key]) for key, values in fields.items()
+        },
+        "cells": [_encode_column(values) for values in cells],
+    }
+
+
+def _encode_field(values, missing):
+    # A field missing from a result is told apart from a null value by the
+    # rows that miss it, or the rows that have it, whichever are fewer.
+    column = _encode_column(values)
+    if len(missing) > len(values) / 2:
+        missing = set(missing)
+        column["present"] = [row for row in range(len(values)) if row not in missing]
+    elif missing:
+        column["missing"] = missing
+    return column
+
+
+def _encode_column(values):
+    # Columns with many repeated values, like outcomes or empty logs,
+    # are stored as a table of the distinct values and indexes into it.
+    # Equal values of different types, like True and 1, are kept apart.
+    table = {}
+    try:
+        codes = [table.setdefault((type(value), value), len(table)) for value in values]
+    except TypeError:  # e.g. lists of extras
+        return {"values": values}
+    if len(table) > len(values) / 2:
+        return {"values": values}
+    return {"table": [value for _, value in table], "codes": codes}
+
+
+def _escape_script_data(chunks):
+    # The data is embedded in a <script> element, so make sure it can't close
+    # the element or open a comment. Both only ever occur inside JSON strings.
+    for chunk in chunks:
+        yield chunk.replace("</", "<\\/").replace("<!--", "\\u003c!--")
+
+
+def _gzip_base64(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)  # gzip container
+    pending = b""
+    for chunk in chunks:
+        pending += compressor.compress(chunk.encode("utf-8"))
+        # only encode whole 3 byte groups, so no padding ends up mid-stream
+        cut = len(pending) - len(pending) % 3
+        if cut:
+            yield base64.b64encode(pending[:cut]).decode("ascii")
+            pending = pending[cut:]
+    pending += compressor.flush()
+    yield base64.b64encode(pending).decode("ascii")
+
+
+def _write_atomic(path, chunks, timings):
+    # Write to a temporary file next to the file and move it into place,
+    # so that readers, e.g. a live report, never see a partially written file.
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with temp_path.open("w", encoding="utf-8") as f:
+            for chunk in chunks:
+                with timings.measure("write"):
+                    f.write(chunk)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def _parse_interval(interval):
+    # accept both "5" and "5s"
+    try:
+        seconds = float(str(interval).strip().removesuffix("s") or 0)
+    except ValueError:
+        seconds = math.nan
+    if not 0 <= seconds < math.inf:
+        raise pytest.UsageError(
+            "generate_report_interval must be a number of seconds, "
+            f"e.g. 5 or 5s, not {interval!r}"
+        )
+    return seconds
+
+
 def _is_error(report):
     return (
         report.when in ["setup", "teardown", "collect"] and report.outcome == "failed"
@@ -343,6 +844,51 @@ def _process_logs(report):
     return log
 
 
+def _process_teardown_log(report):
+    log = []
+    for section in report.sections:
+        header, content = map(escape, section)
+        if "teardown" in header:
+            log.append(f"{' ' + header + ' ':-^80}\n{content}")
+    return "\n".join(log)
+
+
+def _truncate_log(log, limit):
+    # The log is cut at line boundaries, unless that keeps less than half of
+    # the head or tail, and never within an escaped character or ANSI escape
+    # sequence.
+    size = limit // 2
+    head_end = log.rfind("\n", 0, size) + 1
+    if head_end < size // 2:
+        head_end = _cut_index(log, size, forward=False)
+    tail_start = log.find("\n", len(log) - size - 1) + 1 or len(log)
+    if len(log) - tail_start < size // 2:
+        tail_start = _cut_index(log, len(log) - size, forward=True)
+    return log[:head_end], log[max(head_end, tail_start) :]
+
+
+def _cut_index(log, index, forward):
+    # move the index out of an escaped character or escape sequence
+    for match in _UNCUTTABLE.finditer(log, max(index - 32, 0), index + 32):
+        if match.start() < index < match.end():
+            return match.end() if forward else match.start()
+    return index
+
+
+def _links(processed_extras):
+    return [
+        extra
+        for extra in processed_extras
+        if extra["format_type"] in ["json", "text", "url"]
+    ]
+
+
+def _test_id(report):
+    if report.when == "call":
+        return report.nodeid
+    return f"{report.nodeid}::{report.when}"
+
+
 def _process_outcome(report):
     if _is_error(report):
         return "Error"
@@ -0,0 +1,40 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+from typing import Any
+from typing import Callable
+from typing import Optional
+
+
+class Cell(str):
+    """A cell of the results table.
+
+    A cell is the HTML of the table cell, so it can be used wherever the HTML
+    string of a cell is expected, but it also keeps the value it was created
+    from, and the key used for sorting its column.
+
+    :param column: The column type, as set with ``data-column-type`` on the header.
+    :param value: The value of the cell.
+    :param sort_key: The JSON serializable key to sort the column on,
+        defaults to the value.
+    :param renderer: Callable returning the HTML content of the cell for
+        the value, defaults to :class:`str`.
+    """
+
+    column: str
+    value: Any
+    sort_key: Any
+
+    def __new__(
+        cls,
+        column: str,
+        value: Any,
+        sort_key: Optional[Any] = None,
+        renderer: Optional[Callable[[Any], str]] = None,
+    ) -> "Cell":
+        content = renderer(value) if renderer else str(value)
+        cell = super().__new__(cls, f'<td class="col-{column}">{content}</td>')
+        cell.column = column
+        cell.value = value
+        cell.sort_key = value if sort_key is None else sort_key
+        return cell
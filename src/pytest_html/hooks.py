@@ -19,9 +19,19 @@ def pytest_html_results_table_row(report, cells):
     """Called after building results table row."""
 
 
+def pytest_html_results_table_row_batch(reports, rows):
+    """Called after building the results table rows of a batch of finished
+    tests, with their reports and the list of cells of each, in the same order."""
+
+
 def pytest_html_results_table_html(report, data):
     """Called after building results table additional HTML."""
 
 
+def pytest_html_results_table_html_batch(reports, data):
+    """Called after building the results table additional HTML of a batch of
+    finished tests, with their reports and the HTML of each, in the same order."""
+
+
 def pytest_html_duration_format(duration):
     """Called before using the default duration formatting."""
@@ -54,12 +54,37 @@ def pytest_addoption(parser):
         default="passed",
         help="row(s) to render collapsed on open.",
     )
+    parser.addini(
+        "retain_logs",
+        type="string",
+        default="all",
+        help="outcome(s) of the tests whose logs are kept in the report.",
+    )
     parser.addini(
         "max_asset_filename_length",
         default=255,
         help="set the maximum filename length for assets "
         "attached to the html report.",
     )
+    parser.addini(
+        "content_addressed_assets",
+        type="bool",
+        default=False,
+        help="name the assets of the html report after a hash of their "
+        "content, so that identical assets are only written once.",
+    )
+    parser.addini(
+        "asset_write_threads",
+        default=0,
+        help="write the assets of the html report from the given number of "
+        "background threads. 0 writes them while the tests run.",
+    )
+    parser.addini(
+        "max_inline_log_size",
+        default=0,
+        help="set the maximum number of characters of a log embedded in "
+        "the html report, the full log is stored separately. 0 means no limit.",
+    )
     parser.addini(
         "environment_table_redact_list",
         type="linelist",
@@ -72,6 +97,62 @@ def pytest_addoption(parser):
         default="result",
         help="column to initially sort on.",
     )
+    parser.addini(
+        "process_passed_setup_teardown",
+        type="bool",
+        default=False,
+        help="call the results table hooks for passed setup and teardown "
+        "phases, even though they are not shown in the report.",
+    )
+    parser.addini(
+        "convert_ansi_in_browser",
+        type="bool",
+        default=False,
+        help="keep ANSI escape codes in the report data and convert them "
+        "to HTML in the browser when a log is first shown.",
+    )
+    parser.addini(
+        "compress_report_data",
+        type="bool",
+        default=False,
+        help="gzip-compress the test data embedded in the html report.",
+    )
+    parser.addini(
+        "columnar_report_data",
+        type="bool",
+        default=False,
+        help="store the test data embedded in the html report as parallel "
+        "arrays rather than one object per result.",
+    )
+    parser.addini(
+        "shard_report_data",
+        type="bool",
+        default=False,
+        help="store the test results of each module in a separate file "
+        "in the assets directory, loaded when they are first viewed. "
+        "Has no effect on self-contained reports.",
+    )
+    parser.addini(
+        "journal_report_data",
+        type="bool",
+        default=False,
+        help="write the results of finished tests to a journal file next "
+        "to the html report instead of keeping them in memory.",
+    )
+    parser.addini(
+        "report_timings",
+        type="bool",
+        default=False,
+        help="show the time spent in each phase of the html report "
+        "generation in the terminal summary.",
+    )
+    parser.addini(
+        "report_timings_file",
+        type="string",
+        default=None,
+        help="write the time spent in each phase of the html report "
+        "generation to the given JSON file.",
+    )
     parser.addini(
         "generate_report_on_test",
         type="bool",
@@ -79,6 +160,21 @@ def pytest_addoption(parser):
         help="the HTML report will be generated after each test "
         "instead of at the end of the run.",
     )
+    parser.addini(
+        "generate_report_interval",
+        type="string",
+        default="0",
+        help="when generating the report after each test, write it from "
+        "a background thread at most once per given number of seconds.",
+    )
+    parser.addini(
+        "incremental_live_report",
+        type="bool",
+        default=False,
+        help="when generating the report after each test, write the "
+        "report once and append each finished test to a sidecar data file "
+        "instead of re-rendering the whole report.",
+    )
 
 
 def pytest_configure(config):
@@ -104,7 +200,9 @@ def pytest_configure(config):
             # prevent opening html_path on worker nodes (xdist)
             resources_path = Path(__file__).parent.joinpath("resources")
             default_css = Path(resources_path, "style.css")
-            template = _read_template([resources_path])
+            cache = getattr(config, "cache", None)
+            cache_dir = str(cache.mkdir("pytest-html")) if cache else None
+            template = _read_template([resources_path], cache_dir=cache_dir)
             processed_css = _process_css(default_css, extra_css)
             report_data = ReportData(config)
             if config.getoption("self_contained_html"):
@@ -1,8 +1,19 @@
 import base64
 import binascii
+import hashlib
+import json
+import re
+import threading
+import warnings
+from collections import Counter
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
+from pytest_html.basereport import _write_atomic
 from pytest_html.basereport import BaseReport
+from pytest_html.report_data import _serialize
 
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
@@ -16,6 +27,21 @@ class Report(BaseReport):
         self._assets_path.mkdir(parents=True, exist_ok=True)
         self._css_path = Path(self._assets_path, "style.css")
 
+        self._shard_data = config.getini("shard_report_data")
+        self._shards = {}
+        self._content_addressed_assets = config.getini("content_addressed_assets")
+        self._written_assets = set()
+
+        self._asset_writer = None
+        self._failed_assets = []
+        threads = int(config.getini("asset_write_threads"))
+        if threads > 0:
+            self._asset_writer = ThreadPoolExecutor(
+                threads, thread_name_prefix="pytest-html-asset-writer"
+            )
+            # the assets waiting to be written are held in memory
+            self._pending_assets = threading.BoundedSemaphore(threads * 4)
+
         with self._css_path.open("w", encoding="utf-8") as f:
             f.write(self._css)
 
@@ -36,6 +62,77 @@ class Report(BaseReport):
             return content
 
     def _write_content(self, content, asset_name):
+        if self._content_addressed_assets:
+            # identical content is stored once, under the same name
+            digest = hashlib.sha256(content).hexdigest()
+            asset_name = f"{digest}{Path(asset_name).suffix}"
         content_relative_path = Path(self._assets_path, asset_name)
-        content_relative_path.write_bytes(content)
+        if asset_name not in self._written_assets:
+            if self._content_addressed_assets:
+                self._written_assets.add(asset_name)
+            if self._asset_writer:
+                self._pending_assets.acquire()
+                future = self._asset_writer.submit(
+                    content_relative_path.write_bytes, content
+                )
+                future.add_done_callback(
+                    partial(self._asset_written, content_relative_path)
+                )
+            else:
+                content_relative_path.write_bytes(content)
         return str(content_relative_path.relative_to(self._report_path.parent))
+
+    def _asset_written(self, path, future):
+        self._pending_assets.release()
+        if future.exception():
+            self._failed_assets.append((path, future.exception()))
+
+    def _wait_for_assets(self):
+        if self._asset_writer:
+            self._asset_writer.shutdown()
+        for path, error in self._failed_assets:
+            warnings.warn(f"Failed to write the asset {path} of the report: {error}")
+        self._failed_assets.clear()
+
+    def _prepare_test_data(self, test_data):
+        if not self._shard_data:
+            return test_data
+
+        modules = defaultdict(dict)
+        for nodeid, tests in test_data["tests"].items():
+            modules[nodeid.split("::")[0]][nodeid] = tests
+
+        shards = [self._write_shard(module, tests) for module, tests in modules.items()]
+        return {**test_data, "tests": {}, "shards": shards}
+
+    def _write_shard(self, module, tests):
+        # Only modules with new results since the last report are re-written.
+        count = sum(len(results) for results in tests.values())
+        cached_count, shard = self._shards.get(module, (0, None))
+        if shard and cached_count == count:
+            return shard
+
+        digest = hashlib.sha1(module.encode("utf-8")).hexdigest()[:8]
+        module_name = re.sub(r"[^\w.]", "_", module)
+        shard_name = f"data_{module_name}_{digest}.js"
+        shard_path = Path(
+            self._assets_path, shard_name[-self._max_asset_filename_length :]
+        )
+        tests = {
+            nodeid: [_serialize(result) for result in results]
+            for nodeid, results in tests.items()
+        }
+        payload = json.dumps({"module": module, "tests": tests})
+        # shards are re-written while a live report may be loading them
+        _write_atomic(shard_path, [f"pytestHtmlShard({payload});\n"], self._timings)
+
+        outcomes = Counter(
+            result["result"].lower() for results in tests.values() for result in results
+        )
+        shard = {
+            "module": module,
+            "src": shard_path.relative_to(self._report_path.parent).as_posix(),
+            "outcomes": outcomes,
+        }
+        self._shards[module] = (count, shard)
+        return shard
@@ -1,16 +1,151 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import json
 import warnings
 from collections import defaultdict
-from html import escape
 
 from pytest_html.util import _handle_ansi
+from pytest_html.util import Timings
+
+
+class ResultRecord:
+    """A processed test result, serialized to the report data only when the
+    report is generated."""
+
+    __slots__ = (
+        "outcome",
+        "extras",
+        "results_table_row",
+        "column_names",
+        "column_values",
+        "log",
+        "full_log",
+    )
+
+    # the names of the sortable columns are the same for most results,
+    # so they are shared between them
+    _column_names = {}
+
+    def __init__(self, outcome, extras, results_table_row, columns):
+        self.outcome = outcome
+        self.extras = extras
+        # plain strings, the table cells keep more than their HTML
+        self.results_table_row = tuple(str(cell) for cell in results_table_row)
+        names = tuple(columns)
+        self.column_names = self._column_names.setdefault(names, names)
+        self.column_values = tuple(columns.values())
+        self.log = ""
+        self.full_log = None
+
+    def to_json(self):
+        data = {
+            "extras": self.extras,
+            **dict(zip(self.column_names, self.column_values)),
+            "resultsTableRow": self.results_table_row,
+            "log": self.log,
+        }
+        if self.full_log:
+            data["fullLog"] = self.full_log
+        return data
+
+
+def _serialize(result):
+    # results read back from a journal are serialized already
+    return result.to_json() if isinstance(result, ResultRecord) else result
+
+
+class _Results(defaultdict):
+    """Test results kept in memory, by nodeid."""
+
+    def __init__(self):
+        super().__init__(list)
+        self._finished = {}
+
+    def finish(self, nodeid, final=True):
+        # only the results added since the test was last finished,
+        # i.e. those of its latest attempt when it is rerun
+        tests = self.get(nodeid, [])
+        start = self._finished.get(nodeid, 0)
+        self._finished[nodeid] = len(tests)
+        return tests[start:]
+
+    def snapshot(self):
+        # finished tests are never modified, so a shallow copy suffices
+        return {nodeid: list(tests) for nodeid, tests in self.items()}
+
+    def close(self):
+        pass
+
+
+class _ResultJournal:
+    """Test results written to an append-only NDJSON file, by nodeid.
+
+    The results of a test are kept in memory until the test is finished,
+    as its teardown log is still appended to them, and until its last
+    attempt when it is rerun, so that each test is written only once.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._file = path.open("w", encoding="utf-8")
+        self._pending = defaultdict(list)
+        self._finished = {}
+
+    def __getitem__(self, nodeid):
+        return self._pending[nodeid]
+
+    def get(self, nodeid, default=None):
+        return self._pending.get(nodeid, default)
+
+    def finish(self, nodeid, final=True):
+        tests = self._pending.get(nodeid, [])
+        start = self._finished.pop(nodeid, 0)
+        if not final:
+            self._finished[nodeid] = len(tests)
+            return tests[start:]
+        self._pending.pop(nodeid, None)
+        if tests:
+            self._file.write(f"{json.dumps([nodeid, tests], default=_serialize)}\n")
+            self._file.flush()
+        return tests[start:]
+
+    def snapshot(self):
+        pending = [(nodeid, list(tests)) for nodeid, tests in self._pending.items()]
+        return _JournalSnapshot(self._path, self._file.tell(), pending)
+
+    def close(self):
+        self._file.close()
+        self._path.unlink(missing_ok=True)
+
+
+class _JournalSnapshot:
+    """The results journaled up to a point, read back only when iterated."""
+
+    def __init__(self, path, size, pending):
+        self._path = path
+        self._size = size
+        self._pending = pending
+
+    def items(self):
+        read = 0
+        with self._path.open("rb") as f:
+            for line in f:
+                read += len(line)
+                if read > self._size:
+                    break
+                yield json.loads(line)
+        yield from self._pending
 
 
 class ReportData:
     def __init__(self, config):
         self._config = config
+        self._timings = Timings(
+            enabled=bool(
+                config.getini("report_timings") or config.getini("report_timings_file")
+            )
+        )
 
         self._additional_summary = {
             "prefix": [],
@@ -21,6 +156,8 @@ class ReportData:
         self._collected_items = 0
         self._total_duration = 0
         self._running_state = "not_started"
+        # incremented on every change, to tell whether the report is outdated
+        self._revision = 0
 
         self._outcomes = {
             "failed": {"label": "Failed", "value": 0},
@@ -43,7 +180,7 @@ class ReportData:
 
         self._data = {
             "environment": {},
-            "tests": defaultdict(list),
+            "tests": _Results(),
         }
 
         collapsed = config.getini("render_collapsed")
@@ -63,6 +200,15 @@ class ReportData:
         initial_sort = config.getini("initial_sort")
         self._data["initialSort"] = initial_sort
 
+        retain_logs = config.getini("retain_logs")
+        self._retained_log_outcomes = None
+        if retain_logs.lower() != "all":
+            self._retained_log_outcomes = [
+                outcome.strip().lower() for outcome in retain_logs.split(",")
+            ]
+
+        self._convert_ansi_in_browser = config.getini("convert_ansi_in_browser")
+
     @property
     def additional_summary(self):
         return self._additional_summary
@@ -70,6 +216,7 @@ class ReportData:
     @additional_summary.setter
     def additional_summary(self, value):
         self._additional_summary = value
+        self._revision += 1
 
     @property
     def collected_items(self):
@@ -78,6 +225,7 @@ class ReportData:
     @collected_items.setter
     def collected_items(self, count):
         self._collected_items = count
+        self._revision += 1
 
     @property
     def config(self):
@@ -94,6 +242,7 @@ class ReportData:
     @outcomes.setter
     def outcomes(self, outcome):
         self._outcomes[outcome.lower()]["value"] += 1
+        self._revision += 1
 
     @property
     def running_state(self):
@@ -102,6 +251,7 @@ class ReportData:
     @running_state.setter
     def running_state(self, state):
         self._running_state = state
+        self._revision += 1
 
     @property
     def table_header(self):
@@ -110,6 +260,15 @@ class ReportData:
     @table_header.setter
     def table_header(self, header):
         self._results_table_header = header
+        self._revision += 1
+
+    @property
+    def revision(self):
+        return self._revision
+
+    @property
+    def timings(self):
+        return self._timings
 
     @property
     def title(self):
@@ -118,6 +277,7 @@ class ReportData:
     @title.setter
     def title(self, title):
         self._data["title"] = title
+        self._revision += 1
 
     @property
     def total_duration(self):
@@ -126,30 +286,40 @@ class ReportData:
     @total_duration.setter
     def total_duration(self, duration):
         self._total_duration = duration
+        self._revision += 1
 
     def set_data(self, key, value):
         self._data[key] = value
+        self._revision += 1
 
-    def add_test(self, test_data, report, outcome, logs):
-        # regardless of pass or fail we must add teardown logging to "call"
-        if report.when == "teardown":
-            self.append_teardown_log(report)
+    def journal_results(self, path):
+        self._data["tests"] = _ResultJournal(path)
 
+    def finish_test(self, nodeid, final=True):
+        return self._data["tests"].finish(nodeid, final)
+
+    def close_results(self):
+        self._data["tests"].close()
+
+    def retains_log(self, outcome):
+        return (
+            self._retained_log_outcomes is None
+            or outcome.lower() in self._retained_log_outcomes
+        )
+
+    def add_test(self, result, report, outcome, logs):
         # passed "setup" and "teardown" are not added to the html
         if report.when in ["call", "collect"] or (
             report.when in ["setup", "teardown"] and report.outcome != "passed"
         ):
-            test_data["log"] = _handle_ansi("\n".join(logs))
+            result.log = self._handle_ansi("\n".join(logs))
             self.outcomes = outcome
-            self._data["tests"][report.nodeid].append(test_data)
-
-    def append_teardown_log(self, report):
-        log = []
-        if self._data["tests"][report.nodeid]:
-            # Last index is "call"
-            test = self._data["tests"][report.nodeid][-1]
-            for section in report.sections:
-                header, content = map(escape, section)
-                if "teardown" in header:
-                    log.append(f"{' ' + header + ' ':-^80}\n{content}")
-            test["log"] += _handle_ansi("\n".join(log))
+            self._data["tests"][report.nodeid].append(result)
+            self._revision += 1
+
+    def _handle_ansi(self, log):
+        # escape codes are left for the report to convert in the browser
+        if self._convert_ansi_in_browser:
+            return log
+        with self._timings.measure("ansi"):
+            return _handle_ansi(log)
@@ -0,0 +1,117 @@
+// Converts ANSI SGR escape codes to spans, using the same classes as ansi2html
+const ESCAPE_CODES = /\u001b(?:\[([\d;:]*)([a-zA-Z])|\([B0])/g
+
+const DEFAULT_STATE = {
+    intensity: 22,
+    style: 23,
+    blink: 25,
+    underline: 24,
+    crossedout: 29,
+    visibility: 28,
+    foreground: '39',
+    background: '49',
+    negative: 27,
+}
+
+const ATTRIBUTES = {
+    1: 'intensity', 2: 'intensity', 22: 'intensity',
+    3: 'style', 23: 'style',
+    5: 'blink', 6: 'blink', 25: 'blink',
+    4: 'underline', 24: 'underline',
+    9: 'crossedout', 29: 'crossedout',
+    8: 'visibility', 28: 'visibility',
+    7: 'negative', 27: 'negative',
+}
+
+const isColor = (code, min) => {
+    // the high intensity colors are 60 above the regular ones
+    const base = code >= min + 60 ? code - 60 : code
+    return base >= min && base <= min + 7
+}
+
+const extendedColor = (codes, index) => {
+    // 38;5;n and 48;5;n select from 256 colors, 38;2;r;g;b and 48;2;r;g;b are true colors
+    if (codes[index + 1] === 5 && index + 2 < codes.length) {
+        return [`${codes[index]}-${codes[index + 2]}`, 3]
+    }
+    if (codes[index + 1] === 2 && index + 4 < codes.length) {
+        const rgb = codes.slice(index + 2, index + 5).map((value) => String(value).padStart(3, '0'))
+        return [`${codes[index]}-${rgb.join('')}`, 5]
+    }
+    return [null, codes.length - index]
+}
+
+const applyCodes = (state, params) => {
+    const codes = params.split(/[;:]/).map(Number)
+    let index = 0
+    while (index < codes.length) {
+        const code = codes[index]
+        let consumed = 1
+        if (code === 0) {
+            Object.assign(state, DEFAULT_STATE)
+        } else if (ATTRIBUTES[code]) {
+            state[ATTRIBUTES[code]] = code
+        } else if (isColor(code, 30) || code === 39) {
+            state.foreground = String(code)
+        } else if (isColor(code, 40) || code === 49) {
+            state.background = String(code)
+        } else if (code === 38 || code === 48) {
+            const [color, length] = extendedColor(codes, index)
+            if (color) {
+                state[code === 38 ? 'foreground' : 'background'] = color
+            }
+            consumed = length
+        }
+        index += consumed
+    }
+}
+
+const toClasses = (state) => {
+    const classes = ['intensity', 'style', 'blink', 'underline', 'crossedout', 'visibility']
+        .filter((attribute) => state[attribute] !== DEFAULT_STATE[attribute])
+        .map((attribute) => `ansi${state[attribute]}`)
+    const negative = state.negative === 7
+    const prefix = negative ? 'inv' : 'ansi'
+    if (state.foreground !== DEFAULT_STATE.foreground) {
+        classes.push(`${prefix}${state.foreground}`)
+    } else if (negative) {
+        classes.push('inv_background')
+    }
+    if (state.background !== DEFAULT_STATE.background) {
+        classes.push(`${prefix}${state.background}`)
+    } else if (negative) {
+        classes.push('inv_foreground')
+    }
+    return classes.join(' ')
+}
+
+const ansiToHtml = (text) => {
+    const state = { ...DEFAULT_STATE }
+    const parts = []
+    let classes = ''
+    let position = 0
+
+    const append = (end) => {
+        const content = text.slice(position, end)
+        if (content) {
+            parts.push(classes ? `<span class="${classes}">${content}</span>` : content)
+        }
+    }
+
+    for (const match of text.matchAll(ESCAPE_CODES)) {
+        append(match.index)
+        position = match.index + match[0].length
+        // other escape sequences, e.g. moving the cursor, are dropped
+        if (match[2] === 'm') {
+            applyCodes(state, match[1])
+            classes = toClasses(state)
+        }
+    }
+    append(text.length)
+
+    return parts.join('')
+}
+
+module.exports = {
+    ansiToHtml,
+}
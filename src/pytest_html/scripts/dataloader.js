@@ -0,0 +1,69 @@
+const decompress = async (encoded) => {
+    const bytes = Uint8Array.from(atob(encoded), (char) => char.charCodeAt(0))
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'))
+    return await new Response(stream).text()
+}
+
+const columnValue = ({ values, table, codes }, row) => table ? table[codes[row]] : values[row]
+
+// Fields missing from some results list the rows that miss them, or the rows that have them
+const hasField = ({ missing, present }) => {
+    if (present) {
+        const rows = new Set(present)
+        return (row) => rows.has(row)
+    }
+    const rows = new Set(missing)
+    return (row) => !rows.has(row)
+}
+
+const decodeColumnar = ({ rows, fields, cells }) => {
+    // Rebuild the results, grouped by nodeid, from the parallel arrays
+    const columns = Object.entries(fields).map(([key, column]) => [key, column, hasField(column)])
+    const tests = {}
+    for (let row = 0; row < rows; row++) {
+        const test = {}
+        columns.forEach(([key, column, has]) => {
+            if (has(row)) {
+                test[key] = columnValue(column, row)
+            }
+        })
+        // cells are never null, only missing from results with fewer cells
+        test.resultsTableRow = cells.map((column) => columnValue(column, row)).filter((cell) => cell !== null)
+
+        const { nodeid, ...result } = test
+        if (!tests[nodeid]) {
+            tests[nodeid] = []
+        }
+        tests[nodeid].push(result)
+    }
+    return tests
+}
+
+const getData = async (container) => {
+    const { encoding } = container.dataset
+    const json = encoding === 'gzip' ? await decompress(container.textContent) : container.textContent
+    const { columnar, ...data } = JSON.parse(json)
+    return columnar ? { ...data, tests: decodeColumnar(columnar) } : data
+}
+
+const loadedShards = {}
+
+const loadShard = ({ module, src }) => new Promise((resolve, reject) => {
+    window.pytestHtmlShard = ({ module: name, tests }) => {
+        loadedShards[name] = tests
+    }
+    const script = document.createElement('script')
+    script.src = src
+    script.onload = () => {
+        script.remove()
+        resolve(loadedShards[module])
+    }
+    script.onerror = () => reject(new Error(`Unable to load results from ${src}`))
+    document.body.appendChild(script)
+})
+
+module.exports = {
+    decodeColumnar,
+    getData,
+    loadShard,
+}
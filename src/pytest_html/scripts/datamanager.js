@@ -1,27 +1,46 @@
-const { getCollapsedCategory, setCollapsedIds } = require('./storage.js')
+const { getCollapsedCategory, getCollapsedIds, setCollapsedIds } = require('./storage.js')
+
+const prepareTests = (tests, renderCollapsed, offset, collapsedIds) => {
+    const collapsedCategories = [...getCollapsedCategory(renderCollapsed)]
+    return tests.map((test, index) => {
+        const collapsed = collapsedCategories.includes(test.result.toLowerCase())
+        const id = `test_${offset + index}`
+        if (collapsed) {
+            collapsedIds.push(id)
+        }
+        return {
+            ...test,
+            id,
+            collapsed,
+        }
+    })
+}
 
 class DataManager {
     setManager(data) {
-        const collapsedCategories = [...getCollapsedCategory(data.renderCollapsed)]
         const collapsedIds = []
-        const tests = Object.values(data.tests).flat().map((test, index) => {
-            const collapsed = collapsedCategories.includes(test.result.toLowerCase())
-            const id = `test_${index}`
-            if (collapsed) {
-                collapsedIds.push(id)
-            }
-            return {
-                ...test,
-                id,
-                collapsed,
-            }
-        })
+        const tests = prepareTests(Object.values(data.tests).flat(), data.renderCollapsed, 0, collapsedIds)
         const dataBlob = { ...data, tests }
         this.data = { ...dataBlob }
         this.renderData = { ...dataBlob }
         setCollapsedIds(collapsedIds)
     }
 
+    addTests(tests) {
+        const collapsedIds = getCollapsedIds()
+        const added = prepareTests(tests, this.data.renderCollapsed, this.data.tests.length, collapsedIds)
+        this.data.tests = [...this.data.tests, ...added]
+        setCollapsedIds(collapsedIds)
+    }
+
+    markShardLoaded(src) {
+        this.data.shards = this.data.shards.map((shard) => shard.src === src ? { ...shard, loaded: true } : shard)
+    }
+
+    get pendingShards() {
+        return (this.data.shards || []).filter(({ loaded }) => !loaded)
+    }
+
     get allData() {
         return { ...this.data }
     }
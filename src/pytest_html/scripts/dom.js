@@ -1,6 +1,8 @@
 const mediaViewer = require('./mediaviewer.js')
+const { ansiToHtml } = require('./ansi.js')
 const templateEnvRow = document.getElementById('template_environment_row')
 const templateResult = document.getElementById('template_results-table__tbody')
+const templateShard = document.getElementById('template_results-table__shard')
 
 function htmlToElements(html) {
     const temp = document.createElement('template')
@@ -22,6 +24,42 @@ const findAll = (selector, elem) => {
     return [...elem.querySelectorAll(selector)]
 }
 
+const convertedLogs = new Map()
+
+const formatLog = (id, log) => {
+    // Logs kept with their ANSI escape codes are converted once, the first time they are shown
+    if (log.includes('\u001b')) {
+        if (!convertedLogs.has(id)) {
+            convertedLogs.set(id, ansiToHtml(log))
+        }
+        log = convertedLogs.get(id)
+    }
+    // Wrap lines starting with "E" with span.error to color those lines red
+    return log.replace(/^E.*$/gm, (match) => `<span class="error">${match}</span>`)
+}
+
+const openFullLog = (evt) => {
+    // Self-contained reports embed the full log, which is only decoded when opened
+    const { href } = evt.currentTarget
+    if (href.startsWith('data:')) {
+        evt.preventDefault()
+        const [header, content] = href.split(',')
+        const bytes = Uint8Array.from(atob(content), (char) => char.charCodeAt(0))
+        const type = header.slice('data:'.length).split(';base64')[0]
+        window.open(URL.createObjectURL(new Blob([bytes], { type })))
+    }
+}
+
+const addFullLogLink = (logElement, fullLog) => {
+    const link = document.createElement('a')
+    link.className = 'full-log'
+    link.href = fullLog
+    link.target = '_blank'
+    link.textContent = 'show full log'
+    link.addEventListener('click', openFullLog)
+    logElement.prepend(link)
+}
+
 const dom = {
     getStaticRow: (key, value) => {
         const envRow = templateEnvRow.content.cloneNode(true)
@@ -36,7 +74,7 @@ const dom = {
 
         return envRow
     },
-    getResultTBody: ({ testId, id, log, extras, resultsTableRow, tableHtml, result, collapsed }) => {
+    getResultTBody: ({ testId, id, log, fullLog, extras, resultsTableRow, tableHtml, result, collapsed }) => {
         const resultBody = templateResult.content.cloneNode(true)
         resultBody.querySelector('tbody').classList.add(result.toLowerCase())
         resultBody.querySelector('tbody').id = testId
@@ -49,9 +87,14 @@ const dom = {
         })
 
         if (log) {
-            // Wrap lines starting with "E" with span.error to color those lines red
-            const wrappedLog = log.replace(/^E.*$/gm, (match) => `<span class="error">${match}</span>`)
-            resultBody.querySelector('.log').innerHTML = wrappedLog
+            // The log of a collapsed row is only rendered once the row is expanded
+            if (!collapsed || !log.includes('\u001b')) {
+                const logElement = resultBody.querySelector('.log')
+                logElement.innerHTML = formatLog(id, log)
+                if (fullLog) {
+                    addFullLogLink(logElement, fullLog)
+                }
+            }
         } else {
             resultBody.querySelector('.log').remove()
         }
@@ -82,6 +125,13 @@ const dom = {
 
         return resultBody
     },
+    getShardTBody: ({ module, outcomes }) => {
+        const shardBody = templateShard.content.cloneNode(true)
+        const counts = Object.entries(outcomes).map(([result, count]) => `${count} ${result}`)
+        shardBody.querySelector('.col-shard').textContent = `${module} (${counts.join(', ')})`
+
+        return shardBody
+    },
 }
 
 module.exports = {
@@ -2,15 +2,21 @@ const { redraw, bindEvents, renderStatic } = require('./main.js')
 const { doInitFilter } = require('./filter.js')
 const { doInitSort } = require('./sort.js')
 const { manager } = require('./datamanager.js')
-const data = JSON.parse(document.getElementById('data-container').dataset.jsonblob)
+const { getData } = require('./dataloader.js')
+const { startLiveUpdates } = require('./live.js')
+const dataContainer = document.getElementById('data-container')
 
-function init() {
+async function init() {
+    const data = await getData(dataContainer)
     manager.setManager(data)
     doInitFilter()
     doInitSort()
     renderStatic()
     redraw()
     bindEvents()
+    if (dataContainer.dataset.liveSrc) {
+        startLiveUpdates(dataContainer.dataset.liveSrc)
+    }
 }
 
 init()
@@ -0,0 +1,68 @@
+const { addTests } = require('./main.js')
+const { manager } = require('./datamanager.js')
+
+const POLL_INTERVAL = 2000
+
+const updateSummary = () => {
+    const { tests } = manager.allData
+    const relevantOutcomes = ['passed', 'failed', 'xpassed', 'xfailed']
+    let done = 0
+
+    document.querySelectorAll('input[name="filter_checkbox"]').forEach((input) => {
+        const { testResult } = input.dataset
+        const count = tests.filter(({ result }) => result.toLowerCase() === testResult).length
+        const label = input.nextElementSibling
+        label.textContent = label.textContent.replace(/^\d+/, count)
+        input.disabled = !count
+        if (relevantOutcomes.includes(testResult)) {
+            done += count
+        }
+    })
+
+    const runCount = document.querySelector('.run-count')
+    runCount.textContent = runCount.textContent.replace(/^\d+/, done)
+}
+
+const addLiveResults = (entries) => {
+    addTests(entries.flatMap(([, tests]) => tests))
+    updateSummary()
+}
+
+const startLiveUpdates = (src) => {
+    const reloadedKey = `liveReloaded:${src}`
+    let seen = 0
+
+    const poll = () => {
+        window.pytestHtmlLive = []
+        const script = document.createElement('script')
+        script.src = `${src}?${Date.now()}`
+        script.onload = () => {
+            script.remove()
+            sessionStorage.removeItem(reloadedKey)
+            const entries = window.pytestHtmlLive.slice(seen)
+            if (entries.length) {
+                seen += entries.length
+                addLiveResults(entries)
+            }
+            setTimeout(poll, POLL_INTERVAL)
+        }
+        // The sidecar file is removed once the run is finished, and the
+        // report reloaded. If the sidecar is still missing after reloading,
+        // e.g. for a report copied during the run, polling stops instead.
+        script.onerror = () => {
+            script.remove()
+            if (sessionStorage.getItem(reloadedKey)) {
+                sessionStorage.removeItem(reloadedKey)
+                return
+            }
+            sessionStorage.setItem(reloadedKey, 'true')
+            location.reload()
+        }
+        document.body.appendChild(script)
+    }
+    setTimeout(poll, POLL_INTERVAL)
+}
+
+module.exports = {
+    startLiveUpdates,
+}
@@ -1,7 +1,8 @@
 const { dom, find, findAll } = require('./dom.js')
 const { manager } = require('./datamanager.js')
-const { doSort } = require('./sort.js')
-const { doFilter } = require('./filter.js')
+const { loadShard } = require('./dataloader.js')
+const { doInitSort, doSort } = require('./sort.js')
+const { doFilter, doInitFilter } = require('./filter.js')
 const {
     getVisible,
     getCollapsedIds,
@@ -45,10 +46,20 @@ const addItemToggleListener = (elem) => {
     })
 }
 
+const addShardLoadListener = (elem, shard) => {
+    elem.addEventListener('click', async () => {
+        const tests = await loadShard(shard)
+        manager.markShardLoaded(shard.src)
+        addTests(Object.values(tests).flat())
+    })
+}
+
 const renderContent = (tests) => {
     const sortAttr = getSort(manager.initialSort)
     const sortAsc = JSON.parse(getSortDirection())
     const rows = tests.map(dom.getResultTBody)
+    const visible = getVisible()
+    const shards = manager.pendingShards.filter(({ outcomes }) => visible.some((result) => outcomes[result]))
     const table = document.getElementById('results-table')
     const tableHeader = document.getElementById('results-table-head')
 
@@ -60,7 +71,7 @@ const renderContent = (tests) => {
     tableHeader.querySelector(`.sortable[data-column-type="${sortAttr}"]`)?.classList.add(sortAsc ? 'desc' : 'asc')
     newTable.appendChild(tableHeader)
 
-    if (!rows.length) {
+    if (!rows.length && !shards.length) {
         const emptyTable = document.getElementById('template_results-table__body--empty').content.cloneNode(true)
         newTable.appendChild(emptyTable)
     } else {
@@ -73,11 +84,29 @@ const renderContent = (tests) => {
                 newTable.appendChild(row)
             }
         })
+        shards.forEach((shard) => {
+            const row = dom.getShardTBody(shard)
+            addShardLoadListener(find('.col-shard', row), shard)
+            newTable.appendChild(row)
+        })
     }
 
     table.replaceWith(newTable)
 }
 
+const addTests = (tests) => {
+    manager.addTests(tests)
+    doInitFilter()
+    doInitSort()
+
+    const collapsedIds = getCollapsedIds()
+    manager.setRender(manager.testSubset.map((test) => ({
+        ...test,
+        collapsed: collapsedIds.includes(test.id),
+    })))
+    redraw()
+}
+
 const renderDerived = () => {
     const currentFilter = getVisible()
     possibleFilters.forEach((result) => {
@@ -144,6 +173,7 @@ const redraw = () => {
 }
 
 module.exports = {
+    addTests,
     redraw,
     bindEvents,
     renderStatic,
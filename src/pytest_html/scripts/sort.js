@@ -25,17 +25,22 @@ const genericSort = (list, key, ascending, customOrder) => {
 }
 
 const durationSort = (list, ascending) => {
+    // Durations are numbers of seconds, unless a plugin replaced the
+    // duration cell, in which case only the formatted string is known.
     const parseDuration = (duration) => {
+        if (typeof duration === 'number') {
+            return duration
+        }
         if (duration.includes(':')) {
             // If it's in the format "HH:mm:ss"
             const [hours, minutes, seconds] = duration.split(':').map(Number)
-            return (hours * 3600 + minutes * 60 + seconds) * 1000
-        } else {
-            // If it's in the format "nnn ms"
-            return parseInt(duration)
+            return hours * 3600 + minutes * 60 + seconds
         }
+        // If it's in the format "nnn ms"
+        return parseInt(duration) / 1000
     }
-    const sorted = list.sort((a, b) => parseDuration(a['duration']) - parseDuration(b['duration']))
+    const keys = new Map(list.map((test) => [test, parseDuration(test['duration'])]))
+    const sorted = list.sort((a, b) => keys.get(a) - keys.get(b))
     if (ascending) {
         sorted.reverse()
     }
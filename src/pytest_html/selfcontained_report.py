@@ -36,4 +36,4 @@ class SelfContainedReport(BaseReport):
             return content
 
     def _generate_report(self, *args, **kwargs):
-        super()._generate_report(self_contained=True)
+        super()._generate_report(*args, self_contained=True, **kwargs)
@@ -1,33 +1,223 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
-from functools import partial
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextlib import nullcontext
+from functools import lru_cache
 
 from jinja2 import Environment
+from jinja2 import FileSystemBytecodeCache
 from jinja2 import FileSystemLoader
 from jinja2 import select_autoescape
 
+# Select Graphic Rendition codes, which set the style of the following text.
+# Other escape sequences, e.g. moving the cursor, are removed.
+_ANSI_ESCAPE_SEQUENCES = re.compile(r"\x1b(?:\[([\d;:]*)([a-zA-Z])|\([B0])")
+
+_ANSI_DEFAULT_STATE = {
+    "intensity": 22,
+    "style": 23,
+    "blink": 25,
+    "underline": 24,
+    "crossedout": 29,
+    "visibility": 28,
+    "foreground": "39",
+    "background": "49",
+    "negative": 27,
+}
+
+_ANSI_ATTRIBUTES = {
+    **dict.fromkeys([1, 2, 22], "intensity"),
+    **dict.fromkeys([3, 23], "style"),
+    **dict.fromkeys([5, 6, 25], "blink"),
+    **dict.fromkeys([4, 24], "underline"),
+    **dict.fromkeys([9, 29], "crossedout"),
+    **dict.fromkeys([8, 28], "visibility"),
+    **dict.fromkeys([7, 27], "negative"),
+}
+
+# xterm colors, used when ansi2html is not available to provide its styles
+_ANSI_COLORS = [
+    "#000000",
+    "#cd0000",
+    "#00cd00",
+    "#cdcd00",
+    "#0000ee",
+    "#cd00cd",
+    "#00cdcd",
+    "#e5e5e5",
+    "#7f7f7f",
+    "#ff0000",
+    "#00ff00",
+    "#ffff00",
+    "#5c5cff",
+    "#ff00ff",
+    "#00ffff",
+    "#ffffff",
+]
+
+
+def _apply_sgr_codes(state, params):
+    codes = [int(code) if code else 0 for code in re.split("[;:]", params)]
+    index = 0
+    while index < len(codes):
+        code = codes[index]
+        index += 1
+        if code == 0:
+            state.update(_ANSI_DEFAULT_STATE)
+        elif code in _ANSI_ATTRIBUTES:
+            state[_ANSI_ATTRIBUTES[code]] = code
+        elif 30 <= code <= 37 or 90 <= code <= 97 or code == 39:
+            state["foreground"] = str(code)
+        elif 40 <= code <= 47 or 100 <= code <= 107 or code == 49:
+            state["background"] = str(code)
+        elif code in (38, 48):
+            # 38;5;n and 48;5;n select one of 256 colors,
+            # 38;2;r;g;b and 48;2;r;g;b a true color
+            mode = codes[index] if index < len(codes) else None
+            if mode == 5 and index + 1 < len(codes):
+                color = f"{code}-{codes[index + 1]}"
+                index += 2
+            elif mode == 2 and index + 3 < len(codes):
+                rgb = "".join(f"{value:03d}" for value in codes[index + 1 : index + 4])
+                color = f"{code}-{rgb}"
+                index += 4
+            else:
+                break
+            state["foreground" if code == 38 else "background"] = color
+
+
+def _sgr_classes(state):
+    # the same classes as ansi2html uses, to be styled by its stylesheet
+    classes = [
+        f"ansi{state[attribute]}"
+        for attribute in _ANSI_DEFAULT_STATE
+        if attribute not in ("foreground", "background", "negative")
+        and state[attribute] != _ANSI_DEFAULT_STATE[attribute]
+    ]
+    negative = state["negative"] == 7
+    prefix = "inv" if negative else "ansi"
+    for attribute, inverted in [
+        ("foreground", "inv_background"),
+        ("background", "inv_foreground"),
+    ]:
+        if state[attribute] != _ANSI_DEFAULT_STATE[attribute]:
+            classes.append(f"{prefix}{state[attribute]}")
+        elif negative:
+            classes.append(inverted)
+    return " ".join(classes)
+
+
+@lru_cache(maxsize=1024)
+def _sgr_transition(state, params):
+    # Logs tend to repeat the same few escape codes,
+    # so the resulting states and their classes are cached.
+    new_state = dict(zip(_ANSI_DEFAULT_STATE, state))
+    _apply_sgr_codes(new_state, params)
+    return tuple(new_state.values()), _sgr_classes(new_state)
+
+
+def _ansi_to_html(text):
+    """Convert ANSI escape codes to spans, in a single pass over the text."""
+    state = tuple(_ANSI_DEFAULT_STATE.values())
+    parts = []
+    classes = ""
+    position = 0
+    for match in _ANSI_ESCAPE_SEQUENCES.finditer(text):
+        start, end = match.span()
+        if start > position:
+            content = text[position:start]
+            parts.append(
+                f'<span class="{classes}">{content}</span>' if classes else content
+            )
+        position = end
+        if match[2] == "m":
+            state, classes = _sgr_transition(state, match[1])
+    if position < len(text):
+        content = text[position:]
+        parts.append(
+            f'<span class="{classes}">{content}</span>' if classes else content
+        )
+    return "".join(parts)
+
+
+def _default_ansi_styles():
+    def cube(value):
+        return 55 + value * 40 if value else 0
+
+    colors = dict(enumerate(_ANSI_COLORS))
+    for index in range(216):
+        red, green, blue = (cube(index // 36), cube(index // 6 % 6), cube(index % 6))
+        colors[16 + index] = f"#{red:02x}{green:02x}{blue:02x}"
+    for index in range(24):
+        colors[232 + index] = "#{0:02x}{0:02x}{0:02x}".format(8 + index * 10)
+
+    styles = [
+        ".inv_foreground { color: #ffffff; }",
+        ".inv_background { background-color: #000000; }",
+        ".ansi1 { font-weight: bold; }",
+        ".ansi2 { font-weight: lighter; }",
+        ".ansi3 { font-style: italic; }",
+        ".ansi4 { text-decoration: underline; }",
+        ".ansi5, .ansi6 { text-decoration: blink; }",
+        ".ansi8 { visibility: hidden; }",
+        ".ansi9 { text-decoration: line-through; }",
+    ]
+    classes = [(f"{30 + index}", f"{40 + index}", colors[index]) for index in range(8)]
+    classes += [
+        (f"{90 + index}", f"{100 + index}", colors[8 + index]) for index in range(8)
+    ]
+    classes += [
+        (f"38-{index}", f"48-{index}", color) for index, color in colors.items()
+    ]
+    for foreground, background, color in classes:
+        styles.append(f".ansi{foreground}, .inv{background} {{ color: {color}; }}")
+        styles.append(
+            f".ansi{background}, .inv{foreground} {{ background-color: {color}; }}"
+        )
+    return styles
+
+
 try:
-    from ansi2html import Ansi2HTMLConverter, style
+    from ansi2html import style
 
-    converter = Ansi2HTMLConverter(inline=False, escaped=False)
-    _handle_ansi = partial(converter.convert, full=False)
     _ansi_styles = style.get_styles()
 except ImportError:
-    from _pytest.logging import _remove_ansi_escape_sequences
+    _ansi_styles = _default_ansi_styles()
+
 
-    _handle_ansi = _remove_ansi_escape_sequences
-    _ansi_styles = []
+def _remove_ansi(text):
+    return _ANSI_ESCAPE_SEQUENCES.sub("", text)
 
 
-def _read_template(search_paths, template_name="index.jinja2"):
-    env = Environment(
+def _handle_ansi(text):
+    # Most logs contain no escape codes at all, the conversion
+    # would leave them untouched at a considerable cost.
+    if "\x1b" not in text:
+        return text
+    return _ansi_to_html(text)
+
+
+def _read_template(search_paths, template_name="index.jinja2", cache_dir=None):
+    env = _template_environment(tuple(search_paths), cache_dir)
+    return env.get_template(template_name)
+
+
+@lru_cache
+def _template_environment(search_paths, cache_dir):
+    # Compiled templates are kept by the environment for the whole process,
+    # and their bytecode is persisted in the cache directory between runs.
+    return Environment(
         loader=FileSystemLoader(search_paths),
         autoescape=select_autoescape(
             enabled_extensions=("jinja2",),
         ),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir) if cache_dir else None,
     )
-    return env.get_template(template_name)
 
 
 def _process_css(default_css, extra_css):
@@ -47,10 +237,69 @@ def _process_css(default_css, extra_css):
     if _ansi_styles:
         ansi_css = [
             "\n/******************************",
-            " * ANSI2HTML STYLES",
+            " * ANSI STYLES",
             " ******************************/\n",
         ]
         ansi_css.extend([str(r) for r in _ansi_styles])
         css += "\n".join(ansi_css)
 
     return css
+
+
+# the phases are not measured when no timings are reported
+_NOT_MEASURED = nullcontext()
+
+
+class Timings:
+    """Accumulates the time spent in each phase of the report generation.
+
+    Phases can be nested, the time of a nested phase is only accounted to it
+    and not to the phase it is nested in. Nothing is measured unless enabled.
+    """
+
+    def __init__(self, enabled=True):
+        self._enabled = enabled
+        self._totals = defaultdict(float)
+        # phases are measured both by the report writer and the main thread
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def totals(self):
+        with self._lock:
+            return dict(self._totals)
+
+    def measure(self, phase):
+        if not self._enabled:
+            return _NOT_MEASURED
+        return self._measure(phase)
+
+    @contextmanager
+    def _measure(self, phase):
+        stack = self._local.__dict__.setdefault("stack", [])
+        # time spent in phases nested in this one
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._totals[phase] += elapsed - stack.pop()
+            if stack:
+                stack[-1] += elapsed
+
+    def measure_iter(self, phase, iterable):
+        if not self._enabled:
+            return iterable
+        return self._measure_iter(phase, iterable)
+
+    def _measure_iter(self, phase, iterable):
+        iterator = iter(iterable)
+        while True:
+            with self.measure(phase):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
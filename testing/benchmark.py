@@ -0,0 +1,278 @@
+"""Benchmark report generation at scale.
+
+Synthetic ``TestReport`` objects are fed through the plugin the same way
+pytest does during a run, to measure the overhead pytest-html adds per test,
+the time taken to write the final report, the peak memory usage and the size
+of the report on disk. Every case runs in a separate process.
+
+With ``--ansi``, the built-in ANSI converter is compared with ansi2html on
+logs of increasing size instead.
+
+Run ``python testing/benchmark.py --help`` for the available options.
+"""
+
+import argparse
+import base64
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from _pytest.config import _prepareconfig
+from _pytest.reports import TestReport
+
+from pytest_html import extras
+from pytest_html.basereport import BaseReport
+from pytest_html.util import _ansi_to_html
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+VARIANTS = ["plain", "logs", "ansi", "extras", "reruns"]
+REPORTS = ["report", "self-contained"]
+ANSI_SIZES = [1_000, 100_000, 10_000_000]
+
+PNG = base64.b64encode(
+    bytes.fromhex(
+        "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+        "1f15c4890000000d49444154789c63f8cfc0f01f0005000201f5a3a5d2"
+        "0000000049454e44ae426082"
+    )
+).decode()
+LOG = "".join(
+    f"log line {i}: the quick brown fox jumps over the lazy dog\n" for i in range(32)
+)
+ANSI_LOG = "".join(
+    f"\x1b[1m\x1b[32mPASSED\x1b[0m line {i}: \x1b[31mthe quick brown fox\x1b[0m\n"
+    for i in range(32)
+)
+LONGREPR = "def test():\n>       assert False\nE       assert False\n\ntest.py:2: AssertionError"
+
+
+def _make_reports(index, variant):
+    nodeid = f"test_module_{index // 100}.py::test_case_{index}"
+    location = (nodeid.split("::")[0], index, nodeid.split("::")[1])
+    outcome = "failed" if index % 20 == 0 else "passed"
+    sections = []
+    if variant == "logs":
+        sections = [("Captured stdout call", LOG)]
+    elif variant == "ansi":
+        sections = [("Captured stdout call", ANSI_LOG)]
+
+    def report(when, outcome="passed", **kwargs):
+        longrepr = LONGREPR if outcome in ["failed", "rerun"] else None
+        return TestReport(
+            nodeid,
+            location,
+            {},
+            outcome,
+            longrepr,
+            when,
+            sections=sections if when == "call" else [],
+            duration=0.001 * (index % 1000),
+            **kwargs,
+        )
+
+    attempts = []
+    if variant == "reruns" and outcome == "failed":
+        attempts = [
+            [report("setup"), report("call", "rerun"), report("teardown")]
+            for _ in range(2)
+        ]
+        for rerun, attempt in enumerate(attempts):
+            for each in attempt:
+                each.rerun = rerun
+
+    call_extras = []
+    if variant == "extras":
+        call_extras = [
+            extras.png(PNG),
+            extras.text("some text"),
+            extras.url("https://example.com"),
+        ]
+    final = [
+        report("setup"),
+        report("call", outcome, extras=call_extras),
+        report("teardown"),
+    ]
+    return [each for attempt in attempts + [final] for each in attempt]
+
+
+def _run_case(size, variant, report_type, ini_options, queue):
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = Path(tmp, "report.html")
+        args = [f"--html={report_path}", "-p", "no:cacheprovider", tmp]
+        for option in ini_options:
+            args += ["-o", option]
+        if report_type == "self-contained":
+            args.append("--self-contained-html")
+
+        config = _prepareconfig(args)
+        config._do_configure()
+        try:
+            html = next(
+                plugin
+                for plugin in config.pluginmanager.get_plugins()
+                if isinstance(plugin, BaseReport)
+            )
+            session = SimpleNamespace(config=config, items=range(size))
+            html.pytest_sessionstart(session)
+            html.pytest_collection_finish(session)
+
+            run_time = 0.0
+            for index in range(size):
+                reports = _make_reports(index, variant)
+                start = time.perf_counter()
+                for report in reports:
+                    html.pytest_runtest_logreport(report)
+                run_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            html.pytest_sessionfinish(session)
+            generation_time = time.perf_counter() - start
+        finally:
+            config._ensure_unconfigure()
+
+        output_size = sum(
+            path.stat().st_size for path in Path(tmp).rglob("*") if path.is_file()
+        )
+
+    peak_rss = None
+    if resource:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # reported in kilobytes on Linux, but bytes on macOS
+        peak_rss = peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+    queue.put(
+        {
+            "tests": size,
+            "variant": variant,
+            "report": report_type,
+            "per_test_us": run_time / size * 1e6,
+            "generation_s": generation_time,
+            "peak_rss_mb": peak_rss / 2**20 if peak_rss else None,
+            "output_mb": output_size / 2**20,
+        }
+    )
+
+
+def run_case(size, variant, report_type, ini_options=()):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_run_case, args=(size, variant, report_type, ini_options, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _print_result(result):
+    peak_rss = result["peak_rss_mb"]
+    print(
+        f"{result['tests']:>9} {result['variant']:<8} {result['report']:<15}"
+        f"{result['per_test_us']:>12.1f}"
+        f"{result['generation_s']:>12.3f}"
+        f"{'n/a' if peak_rss is None else f'{peak_rss:.1f}':>12}"
+        f"{result['output_mb']:>12.2f}",
+        flush=True,
+    )
+
+
+def run_ansi(sizes):
+    try:
+        from ansi2html import Ansi2HTMLConverter
+    except ImportError:
+        Ansi2HTMLConverter = None
+
+    print(f"{'log bytes':>12}{'built-in s':>12}{'ansi2html s':>12}")
+    results = []
+    for size in sizes:
+        log = (ANSI_LOG * (size // len(ANSI_LOG) + 1))[:size]
+        converters = {"built-in": _ansi_to_html}
+        if Ansi2HTMLConverter:
+            converter = Ansi2HTMLConverter(inline=False, escaped=False)
+            converters["ansi2html"] = lambda text: converter.convert(text, full=False)
+
+        result = {"log_bytes": size}
+        for name, convert in converters.items():
+            start = time.perf_counter()
+            convert(log)
+            result[f"{name}_s"] = time.perf_counter() - start
+        ansi2html_time = result.get("ansi2html_s")
+        print(
+            f"{size:>12}{result['built-in_s']:>12.3f}"
+            f"{'n/a' if ansi2html_time is None else f'{ansi2html_time:.3f}':>12}",
+            flush=True,
+        )
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=SIZES,
+        help="comma separated numbers of tests (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--variants",
+        type=lambda value: value.split(","),
+        default=VARIANTS,
+        help="comma separated variants out of %(default)s",
+    )
+    parser.add_argument(
+        "--reports",
+        type=lambda value: value.split(","),
+        default=REPORTS,
+        help="comma separated report types out of %(default)s",
+    )
+    parser.add_argument(
+        "--ansi",
+        action="store_true",
+        help="compare the ANSI converters instead, the sizes are log sizes in bytes "
+        f"(default: {ANSI_SIZES})",
+    )
+    parser.add_argument(
+        "--ini",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="set an ini option of the plugin, can be given multiple times",
+    )
+    parser.add_argument("--json", help="write the results to this file as JSON")
+    options = parser.parse_args(argv)
+
+    if options.ansi:
+        sizes = ANSI_SIZES if options.sizes is SIZES else options.sizes
+        results = run_ansi(sizes)
+        if options.json:
+            Path(options.json).write_text(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"{'tests':>9} {'variant':<8} {'report':<15}"
+        f"{'per test µs':>12}{'generate s':>12}{'peak RSS MB':>12}{'output MB':>12}"
+    )
+    results = []
+    for size in options.sizes:
+        for variant in options.variants:
+            for report_type in options.reports:
+                result = run_case(size, variant, report_type, options.ini)
+                _print_result(result)
+                results.append(result)
+
+    if options.json:
+        Path(options.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
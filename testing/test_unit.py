@@ -1,9 +1,23 @@
+import base64
+import gzip
+import hashlib
 import importlib.resources
+import json
+import re
 import sys
+import time
 from pathlib import Path
 
 import pytest
 from assertpy import assert_that
+from bs4 import BeautifulSoup
+
+from pytest_html.basereport import _encode_column
+from pytest_html.basereport import _encode_columnar
+from pytest_html.basereport import _FINISHED_TESTS_BATCH
+from pytest_html.basereport import _ReportWriter
+from pytest_html.basereport import _truncate_log
+from pytest_html.util import _ansi_to_html
 
 pytest_plugins = ("pytester",)
 
@@ -14,6 +28,13 @@ def run(pytester, path="report.html", cmd_flags=None):
     return pytester.runpytest("--html", path, *cmd_flags)
 
 
+def get_data(pytester, path="report.html"):
+    html = pytester.path.joinpath(path).read_text(encoding="utf-8")
+    return json.loads(
+        BeautifulSoup(html, "html.parser").find(id="data-container").string
+    )
+
+
 def file_content():
     return (
         importlib.resources.files("pytest_html")
@@ -146,3 +167,1155 @@ def test_custom_css_selfcontained(pytester, css_file_path, expandvar):
     with open(pytester.path / "report.html") as f:
         html = f.read()
         assert_that(html).contains("* " + str(css_file_path)).contains("* two.css")
+
+
+def test_incremental_live_report(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        generate_report_on_test = true
+        incremental_live_report = true
+    """
+    )
+    pytester.makepyfile(
+        """
+        import json
+        from pathlib import Path
+
+        def test_first():
+            pass
+
+        def test_second():
+            shell = Path("report.html").read_text()
+            assert 'data-live-src="report.live.js"' in shell
+
+            lines = Path("report.live.js").read_text().splitlines()
+            assert len(lines) == 1
+            assert lines[0].startswith("pytestHtmlLive.push(")
+            nodeid, tests = json.loads(lines[0][len("pytestHtmlLive.push("):-2])
+            assert nodeid.endswith("::test_first")
+            assert tests[0]["result"] == "Passed"
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=2)
+
+    assert_that(pytester.path.joinpath("report.live.js").exists()).is_false()
+    html = pytester.path.joinpath("report.html").read_text()
+    assert_that(html).does_not_contain("data-live-src").contains("test_second")
+
+
+def test_incremental_live_report_with_reruns(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        generate_report_on_test = true
+        incremental_live_report = true
+    """
+    )
+    pytester.makepyfile(
+        """
+        import json
+        from pathlib import Path
+
+        attempts = []
+
+        def test_flaky():
+            attempts.append(None)
+            assert len(attempts) > 2
+
+        def test_check():
+            lines = Path("report.live.js").read_text().splitlines()
+            # every attempt only pushes its own result
+            results = [
+                test["result"]
+                for line in lines
+                for test in json.loads(line[len("pytestHtmlLive.push("):-2])[1]
+            ]
+            assert results == ["Rerun", "Rerun", "Passed"]
+    """
+    )
+    result = run(pytester, cmd_flags=["--reruns", "3"])
+    result.assert_outcomes(passed=2)
+
+
+def test_generate_report_interval(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        generate_report_on_test = true
+        generate_report_interval = 60s
+    """
+    )
+    pytester.makepyfile(
+        """
+        import time
+        from pathlib import Path
+
+        report = Path("report.html")
+
+        def test_first():
+            deadline = time.time() + 5
+            while not (report.exists() and "</html>" in report.read_text()):
+                assert time.time() < deadline
+                time.sleep(0.05)
+
+        def test_second():
+            content = report.read_text()
+            time.sleep(0.5)
+            assert report.read_text() == content
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=2)
+
+    html = pytester.path.joinpath("report.html").read_text()
+    assert_that(html).contains("test_second").contains("2 tests took")
+
+
+@pytest.mark.parametrize("interval", ["5m", "1min", "-1", "inf"])
+def test_invalid_generate_report_interval(pytester, interval):
+    pytester.makeini(
+        f"""
+        [pytest]
+        generate_report_on_test = true
+        generate_report_interval = {interval}
+    """
+    )
+    pytester.makepyfile("def test_pass(): pass")
+    result = run(pytester)
+    assert_that(result.ret).is_equal_to(pytest.ExitCode.USAGE_ERROR)
+    result.stderr.fnmatch_lines(
+        [f"ERROR: generate_report_interval must be a number of seconds, *'{interval}'"]
+    )
+
+
+def test_report_writer_survives_errors():
+    calls = []
+
+    def generate():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    def wait_for_calls(count):
+        deadline = time.time() + 5
+        while len(calls) < count:
+            assert time.time() < deadline
+            time.sleep(0.01)
+
+    writer = _ReportWriter(generate, 0)
+    writer.start()
+    writer.request()
+    wait_for_calls(1)
+    writer.request()
+    wait_for_calls(2)
+    with pytest.warns(UserWarning, match="disk full"):
+        writer.stop()
+
+
+def test_streamed_report_data(pytester):
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize(
+            "value", ['"quoted"', "</script>", "<!--", "ünïcode"]
+        )
+        def test_param(value):
+            print(value)
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=4)
+
+    data = get_data(pytester)
+    assert_that(data["tests"]).is_length(4)
+    assert_that(data["tests"]).contains_key(
+        "test_streamed_report_data.py::test_param[</script>]"
+    )
+    assert_that(data["tests"]).contains_key(
+        'test_streamed_report_data.py::test_param["quoted"]'
+    )
+    assert_that(data).contains_key("environment", "renderCollapsed", "initialSort")
+
+
+def test_report_written_atomically_and_only_when_changed(pytester):
+    pytester.makepyfile(
+        """
+        from pathlib import Path
+        from pytest_html.basereport import BaseReport
+
+        def test_write_report(pytestconfig):
+            plugins = pytestconfig.pluginmanager.get_plugins()
+            html = next(p for p in plugins if isinstance(p, BaseReport))
+            report = Path("report.html")
+
+            html._generate_report()
+            inode = report.stat().st_ino
+            html._generate_report()
+            assert report.stat().st_ino == inode
+
+            html._report.set_data("environment", {"changed": "yes"})
+            html._generate_report()
+            assert report.stat().st_ino != inode
+            assert "changed" in report.read_text()
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+    assert_that(list(pytester.path.glob(".report.html.*"))).is_empty()
+
+
+def test_compressed_report_data(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        compress_report_data = true
+    """
+    )
+    pytester.makepyfile(
+        """
+        def test_log():
+            print("repetitive log line\\n" * 10000)
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+
+    html = pytester.path.joinpath("report.html").read_text(encoding="utf-8")
+    container = BeautifulSoup(html, "html.parser").find(id="data-container")
+    assert_that(container["data-encoding"]).is_equal_to("gzip")
+
+    payload = gzip.decompress(base64.b64decode(container.string))
+    assert_that(len(payload)).is_greater_than(len(html) * 10)
+    data = json.loads(payload)
+    assert_that(data["tests"]).contains_key("test_compressed_report_data.py::test_log")
+
+
+def test_report_skeleton_matches_full_render(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_html.basereport import BaseReport
+
+        def test_render(pytestconfig):
+            plugins = pytestconfig.pluginmanager.get_plugins()
+            html = next(p for p in plugins if isinstance(p, BaseReport))
+            html._skeleton = html._render_skeleton(self_contained=False)
+            variables = {
+                **html._static_context,
+                "date": "01-Jan-2024",
+                "time": "12:00:00",
+                "run_count": "1/1 test done.",
+                "running_state": "started",
+                "outcomes": html._report.outcomes,
+                "test_data": ['{"tests": {}}'],
+                "live_data": "report.live.js",
+                "additional_summary": {
+                    "prefix": ["<p>prefix</p>"],
+                    "summary": [],
+                    "postfix": [],
+                },
+            }
+            context = html._template.new_context(variables)
+            rendered = "".join(html._render_report(context))
+            assert rendered == html._template.render(variables)
+            assert "<p>prefix</p>" in rendered
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+
+
+def test_template_bytecode_cache(pytester):
+    pytester.makepyfile("def test_pass(): pass")
+    result = run(pytester, cmd_flags=["-p", "cacheprovider"])
+    result.assert_outcomes(passed=1)
+
+    cache_dir = pytester.path / ".pytest_cache" / "d" / "pytest-html"
+    assert_that(list(cache_dir.glob("__jinja2_*.cache"))).is_not_empty()
+
+
+def test_shard_report_data(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        shard_report_data = true
+    """
+    )
+    pytester.makepyfile(
+        test_one="def test_pass(): pass",
+        test_two="""
+            from pathlib import Path
+            from pytest_html.basereport import BaseReport
+
+            def test_pass(): pass
+            def test_fail(): assert False
+
+            def test_rewritten(pytestconfig):
+                plugins = pytestconfig.pluginmanager.get_plugins()
+                html = next(p for p in plugins if isinstance(p, BaseReport))
+                html._generate_report()
+                [shard] = Path("assets").glob("data_test_two*.js")
+                inode = shard.stat().st_ino
+                # as if there were new results in the module
+                html._shards.clear()
+                html._report.set_data("environment", {"changed": "yes"})
+                html._generate_report()
+                # the shard is replaced, not written in place
+                assert shard.stat().st_ino != inode
+        """,
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=3, failed=1)
+
+    data = get_data(pytester)
+    assert_that(data["tests"]).is_empty()
+    shards = {shard["module"]: shard for shard in data["shards"]}
+    assert_that(shards).is_length(2)
+    assert_that(shards["test_two.py"]["outcomes"]).is_equal_to(
+        {"passed": 2, "failed": 1}
+    )
+    assert_that(list(pytester.path.joinpath("assets").glob(".*.tmp"))).is_empty()
+
+    content = pytester.path.joinpath(shards["test_two.py"]["src"]).read_text()
+    assert_that(content).starts_with("pytestHtmlShard(").ends_with(");\n")
+    shard = json.loads(content[len("pytestHtmlShard(") : -len(");\n")])
+    assert_that(shard["tests"]).contains_key(
+        "test_two.py::test_pass", "test_two.py::test_fail"
+    )
+
+
+def test_report_timings(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        report_timings = true
+        report_timings_file = timings/report.json
+    """
+    )
+    pytester.makeconftest(
+        """
+        import time
+
+        def pytest_html_results_table_row(report, cells):
+            time.sleep(0.01)
+    """
+    )
+    pytester.makepyfile("def test_pass(): print('output')")
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["pytest-html overhead: *s (*)"])
+
+    timings = json.loads(pytester.path.joinpath("timings", "report.json").read_text())
+    assert_that(timings["phases"]).contains_key(
+        "extras", "logs", "serialize", "render", "write"
+    )
+    # only called for the "call" phase, passed setup and teardown are skipped
+    assert_that(
+        timings["phases"]["pytest_html_results_table_row"]
+    ).is_greater_than_or_equal_to(0.01)
+    assert_that(timings["total"]).is_close_to(sum(timings["phases"].values()), 1e-6)
+
+
+def test_report_timings_disabled(pytester):
+    pytester.makepyfile(
+        """
+        from pytest_html.basereport import BaseReport
+
+        def test_first():
+            print("output")
+
+        def test_pass(pytestconfig):
+            plugins = pytestconfig.pluginmanager.get_plugins()
+            html = next(p for p in plugins if isinstance(p, BaseReport))
+            # nothing is measured unless the timings are reported
+            assert html._timings.totals == {}
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=2)
+    result.stdout.no_fnmatch_line("pytest-html overhead*")
+
+
+def test_results_table_cells(pytester):
+    pytester.makeconftest(
+        """
+        from pytest_html.cells import Cell
+
+        def pytest_html_results_table_header(cells):
+            cells.insert(1, '<th class="sortable" data-column-type="size">Size</th>')
+            cells.insert(2, '<th class="sortable" data-column-type="label">Label</th>')
+
+        def pytest_html_results_table_row(report, cells):
+            size = len(report.nodeid)
+            cells.insert(1, Cell("size", size, renderer=lambda v: f"{v} chars"))
+            cells.insert(2, '<td class="col-label">plain</td>')
+    """
+    )
+    pytester.makepyfile("def test_pass(): pass")
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+
+    data = get_data(pytester)
+    test = data["tests"]["test_results_table_cells.py::test_pass"][0]
+    nodeid_length = len("test_results_table_cells.py::test_pass")
+    assert_that(test).contains_entry(
+        {"size": nodeid_length},
+        {"label": "plain"},
+        {"result": "Passed"},
+        {"testId": "test_results_table_cells.py::test_pass"},
+    )
+    assert_that(test["resultsTableRow"][1]).is_equal_to(
+        f'<td class="col-size">{nodeid_length} chars</td>'
+    )
+
+
+def test_duration_sort_key(pytester):
+    pytester.makeconftest(
+        """
+        def pytest_html_duration_format(duration):
+            return "formatted"
+    """
+    )
+    pytester.makepyfile("def test_pass(): pass")
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+
+    data = get_data(pytester)
+    test = data["tests"]["test_duration_sort_key.py::test_pass"][0]
+    assert_that(test["duration"]).is_instance_of(float)
+    assert_that(test["resultsTableRow"][2]).is_equal_to(
+        '<td class="col-duration">formatted</td>'
+    )
+
+
+def test_results_table_batch_hooks(pytester):
+    pytester.makeconftest(
+        """
+        batches = []
+
+        def pytest_html_results_table_row_batch(reports, rows):
+            assert len(reports) == len(rows)
+            batches.append([f"{r.nodeid.split('::')[-1]} {r.when} {r.outcome}" for r in reports])
+            for report, cells in zip(reports, rows):
+                if report.when == "setup" and report.failed:
+                    del cells[:]
+
+        def pytest_html_results_table_html_batch(reports, data):
+            for report, logs in zip(reports, data):
+                logs.append(f"<p>{report.when} batch</p>")
+
+        def pytest_terminal_summary(terminalreporter):
+            for batch in batches:
+                terminalreporter.write_line(f"batch: {', '.join(batch)}")
+    """
+    )
+    # conftest files of subdirectories are only registered during collection
+    pytester.mkpydir("sub").joinpath("conftest.py").write_text(
+        "def pytest_html_results_table_row(report, cells):\n"
+        "    cells.append('<td class=\"col-extra\">row</td>')\n"
+    )
+    pytester.path.joinpath("sub", "test_sub.py").write_text(
+        "import pytest\n"
+        "@pytest.fixture\n"
+        "def broken():\n"
+        "    raise ValueError\n"
+        "def test_pass(): pass\n"
+        "def test_error(broken): pass\n"
+        "attempts = []\n"
+        "@pytest.mark.flaky(reruns=2)\n"
+        "def test_flaky():\n"
+        "    attempts.append(None)\n"
+        "    assert len(attempts) > 2\n"
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=2, errors=1)
+    # all finished tests are processed at once
+    result.stdout.fnmatch_lines(
+        [
+            "batch: test_pass call passed, test_error setup failed, "
+            "test_flaky call rerun, test_flaky call rerun, test_flaky call passed"
+        ]
+    )
+    assert_that(
+        [line for line in result.outlines if line.startswith("batch:")]
+    ).is_length(1)
+
+    data = get_data(pytester)
+    assert_that(data["tests"]).does_not_contain_key("sub/test_sub.py::test_error")
+    test = data["tests"]["sub/test_sub.py::test_pass"][0]
+    assert_that(test["resultsTableRow"][-1]).is_equal_to(
+        '<td class="col-extra">row</td>'
+    )
+    assert_that(test["log"]).ends_with("<p>call batch</p>")
+
+
+def test_results_table_hooks_called_when_test_finishes(pytester):
+    pytester.makeconftest(
+        """
+        events = []
+
+        def pytest_runtest_logfinish(nodeid):
+            events.append(f"finish {nodeid.split('::')[-1]}")
+
+        def pytest_html_results_table_row(report, cells):
+            events.append(f"row {report.nodeid.split('::')[-1]}")
+
+        def pytest_html_results_table_html(report, data):
+            events.append(f"html {report.nodeid.split('::')[-1]}")
+
+        def pytest_html_results_table_row_batch(reports, rows):
+            events.append(f"row batch {len(rows)}")
+            for cells in rows:
+                del cells[:]
+
+        def pytest_html_results_table_html_batch(reports, data):
+            events.append(f"html batch {len(data)}")
+
+        def pytest_terminal_summary(terminalreporter):
+            terminalreporter.write_line(f"events: {', '.join(events)}")
+    """
+    )
+    pytester.makepyfile("def test_a(): pass\ndef test_b(): pass\n")
+    result = run(pytester)
+    result.assert_outcomes(passed=2)
+    # the batch hooks removed every row, so there is no HTML for a batch
+    result.stdout.fnmatch_lines(
+        [
+            "events: row test_a, html test_a, finish test_a, "
+            "row test_b, html test_b, finish test_b, row batch 2"
+        ]
+    )
+
+    data = get_data(pytester)
+    assert_that(data["tests"]).is_empty()
+
+
+@pytest.mark.parametrize("process_passed", [False, True])
+def test_process_passed_setup_teardown(pytester, process_passed):
+    pytester.makeini(
+        f"""
+        [pytest]
+        process_passed_setup_teardown = {process_passed}
+    """
+    )
+    pytester.makeconftest(
+        """
+        phases = []
+
+        def pytest_html_results_table_row(report, cells):
+            phases.append(report.when)
+
+        def pytest_terminal_summary(terminalreporter):
+            terminalreporter.write_line(f"phases: {','.join(phases)}")
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture
+        def resource():
+            yield
+            print("released")
+
+        def test_pass(resource):
+            print("called")
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+    expected = "setup,call,teardown" if process_passed else "call"
+    result.stdout.fnmatch_lines([f"phases: {expected}"])
+
+    data = get_data(pytester)
+    tests = data["tests"]["test_process_passed_setup_teardown.py::test_pass"]
+    assert_that(tests).is_length(1)
+    assert_that(tests[0]["log"]).contains("Captured stdout teardown", "released")
+
+
+def test_ansi_conversion_skipped_without_escape_codes(pytester, mocker):
+    convert = mocker.patch("pytest_html.util._ansi_to_html", side_effect=str)
+    pytester.makepyfile(
+        """
+        def test_plain():
+            print("no escape codes here")
+
+        def test_colored():
+            print("\\x1b[31mred\\x1b[0m")
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=2)
+
+    assert_that(convert.call_count).is_equal_to(1)
+    assert_that(convert.call_args.args[0]).contains("\x1b[31mred")
+
+
+def test_convert_ansi_in_browser(pytester, mocker):
+    convert = mocker.patch("pytest_html.util._ansi_to_html")
+    pytester.makeini(
+        """
+        [pytest]
+        convert_ansi_in_browser = true
+    """
+    )
+    pytester.makepyfile(
+        """
+        def test_colored():
+            print("\\x1b[31mred\\x1b[0m")
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+
+    convert.assert_not_called()
+    data = get_data(pytester)
+    [test] = data["tests"]["test_convert_ansi_in_browser.py::test_colored"]
+    assert_that(test["log"]).contains("\x1b[31mred\x1b[0m")
+
+
+@pytest.mark.parametrize("self_contained", [False, True])
+def test_max_inline_log_size(pytester, self_contained):
+    pytester.makeini(
+        """
+        [pytest]
+        max_inline_log_size = 1000
+    """
+    )
+    pytester.makepyfile(
+        """
+        def test_short():
+            print("short <log>")
+
+        def test_long():
+            for line in range(10000):
+                print(f"line {line} <with markup>")
+    """
+    )
+    result = run(
+        pytester, cmd_flags=["--self-contained-html"] if self_contained else []
+    )
+    result.assert_outcomes(passed=2)
+
+    data = get_data(pytester)
+    [short] = data["tests"]["test_max_inline_log_size.py::test_short"]
+    assert_that(short).does_not_contain_key("fullLog")
+    assert_that(short["log"]).contains("short &lt;log&gt;")
+
+    [long] = data["tests"]["test_max_inline_log_size.py::test_long"]
+    assert_that(len(long["log"])).is_less_than(1100)
+    assert_that(long["log"]).contains(
+        "line 0 &lt;", "characters omitted", "line 9999 &lt;"
+    )
+    assert_that(long["log"]).does_not_contain("line 5000 ")
+
+    if self_contained:
+        assert_that(long["fullLog"]).starts_with("data:text/plain;")
+        full_log = base64.b64decode(long["fullLog"].split(",")[1]).decode("utf-8")
+    else:
+        full_log = pytester.path.joinpath(long["fullLog"]).read_text(encoding="utf-8")
+    assert_that(full_log).contains("line 0 <with markup>", "line 5000 <with markup>")
+
+
+def test_max_inline_log_size_cuts_whole_lines(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        max_inline_log_size = 1000
+    """
+    )
+    pytester.makeconftest(
+        """
+        def pytest_html_results_table_html(report, data):
+            data.append("<div class='plugin'>added by a plugin</div>")
+    """
+    )
+    pytester.makepyfile(
+        """
+        def test_single_line():
+            print("<&>" * 1000, end="")
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+
+    data = get_data(pytester)
+    [test] = data["tests"][
+        "test_max_inline_log_size_cuts_whole_lines.py::test_single_line"
+    ]
+    # the line of output is cut, but none of its escaped characters
+    head, tail = test["log"].split("characters omitted]")
+    assert_that(head).contains("&lt;&amp;&gt;")
+    assert_that(tail).contains("&lt;&amp;&gt;")
+    assert_that(re.sub("&lt;|&amp;|&gt;", "", test["log"])).does_not_contain("&", ";")
+    assert_that(test["log"]).ends_with("<div class='plugin'>added by a plugin</div>")
+
+    full_log = pytester.path.joinpath(test["fullLog"]).read_text(encoding="utf-8")
+    assert_that(full_log).contains("<&>" * 1000).does_not_contain("added by a plugin")
+
+
+@pytest.mark.parametrize("limit", range(40, 80, 7))
+def test_truncate_log_keeps_escapes_whole(limit):
+    log = "\x1b[31m&lt;&amp;\x1b[0m" * 100
+    head, tail = _truncate_log(log, limit)
+    assert_that(len(head)).is_between(limit // 4, limit // 2)
+    assert_that(len(tail)).is_between(limit // 4, limit // 2)
+    for part in [head, tail]:
+        assert_that(re.sub(r"\x1b\[\d+m|&lt;|&amp;", "", part)).is_empty()
+
+
+def test_max_inline_log_size_with_teardown_output(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        max_inline_log_size = 1000
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture
+        def noisy_teardown():
+            yield
+            for line in range(20000):
+                print(f"teardown line {line}")
+
+        def test_noisy(noisy_teardown):
+            print("call output")
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=1)
+
+    data = get_data(pytester)
+    [test] = data["tests"][
+        "test_max_inline_log_size_with_teardown_output.py::test_noisy"
+    ]
+    assert_that(len(test["log"])).is_less_than(1100)
+    assert_that(test["log"]).contains(
+        "call output", "characters omitted", "teardown line 19999"
+    )
+
+    full_log = pytester.path.joinpath(test["fullLog"]).read_text(encoding="utf-8")
+    assert_that(full_log).contains(
+        "call output", "teardown line 0\n", "teardown line 19999"
+    )
+
+
+def test_retain_logs(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        retain_logs = failed, error
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.fixture
+        def teardown_output():
+            yield
+            print("teardown output")
+
+        def test_pass(teardown_output):
+            print("passed output")
+
+        def test_fail(teardown_output):
+            print("failed output")
+            assert False
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=1, failed=1)
+
+    data = get_data(pytester)
+    [passed] = data["tests"]["test_retain_logs.py::test_pass"]
+    assert_that(passed["log"]).is_equal_to("Log output not retained for this outcome.")
+    [failed] = data["tests"]["test_retain_logs.py::test_fail"]
+    assert_that(failed["log"]).contains("failed output", "teardown output")
+
+
+def test_journal_report_data(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        journal_report_data = true
+    """
+    )
+    pytester.makepyfile(
+        """
+        import json
+        from pytest_html.basereport import BaseReport
+
+        def test_first():
+            print("first output")
+
+        def test_journaled(pytestconfig):
+            plugins = pytestconfig.pluginmanager.get_plugins()
+            html = next(p for p in plugins if isinstance(p, BaseReport))
+            assert html._report.data["tests"].get("test_journal_report_data.py::test_first") is None
+
+            journal = html._report_path.with_suffix(".results.jsonl")
+            [[nodeid, tests]] = map(json.loads, journal.read_text().splitlines())
+            assert nodeid == "test_journal_report_data.py::test_first"
+            assert "first output" in tests[0]["log"]
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=2)
+
+    assert_that(pytester.path.joinpath("report.results.jsonl").exists()).is_false()
+    data = get_data(pytester)
+    assert_that(data["tests"]).is_length(2)
+    [first] = data["tests"]["test_journal_report_data.py::test_first"]
+    assert_that(first["log"]).contains("first output")
+
+
+@pytest.mark.parametrize("shard", [False, True])
+def test_journal_report_data_with_reruns(pytester, shard):
+    pytester.makeini(
+        f"""
+        [pytest]
+        journal_report_data = true
+        shard_report_data = {shard}
+    """
+    )
+    pytester.makepyfile(
+        """
+        attempts = []
+
+        def test_flaky():
+            attempts.append(None)
+            assert len(attempts) > 2
+    """
+    )
+    result = run(pytester, cmd_flags=["--reruns", "3"])
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*1 passed*2 rerun*"])
+
+    html = pytester.path.joinpath("report.html").read_text(encoding="utf-8")
+    if shard:
+        [shard_path] = pytester.path.joinpath("assets").glob("data_*.js")
+        payload = shard_path.read_text(encoding="utf-8")
+        payload = payload[len("pytestHtmlShard(") : -len(");\n")]
+    else:
+        payload = BeautifulSoup(html, "html.parser").find(id="data-container").string
+    assert_that(
+        payload.count('"test_journal_report_data_with_reruns.py::test_flaky": ')
+    ).is_equal_to(1)
+    tests = json.loads(payload)["tests"][
+        "test_journal_report_data_with_reruns.py::test_flaky"
+    ]
+    assert_that([test["result"] for test in tests]).is_equal_to(
+        ["Rerun", "Rerun", "Passed"]
+    )
+
+
+@pytest.mark.parametrize("batch_hook", [False, True])
+def test_test_reports_released_when_finished(pytester, batch_hook):
+    pytester.makeconftest(
+        f"""
+        import gc
+        import weakref
+        import pytest
+
+        reports = []
+
+        @pytest.hookimpl(tryfirst=True)
+        def pytest_runtest_logreport(report):
+            reports.append(weakref.ref(report))
+
+        @pytest.fixture
+        def live_reports():
+            gc.collect()
+            return sum(ref() is not None for ref in reports)
+
+        if {batch_hook}:
+            def pytest_html_results_table_row_batch(reports, rows):
+                pass
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        # pytest keeps the reports of the last failure referenced
+        @pytest.mark.flaky(reruns=2)
+        def test_rerun():
+            assert False
+
+        @pytest.mark.parametrize("index", range(300))
+        def test_many(index):
+            print("output" * 100)
+
+        def test_last(live_reports):
+            print(f"live reports: {live_reports}")
+    """
+    )
+    # the terminal reporter keeps every report, and so does an in-process run
+    result = pytester.runpytest_subprocess(
+        "--html", pytester.path.joinpath("report.html"), "-p", "no:terminal"
+    )
+    assert_that(result.ret).is_equal_to(pytest.ExitCode.TESTS_FAILED)
+
+    data = get_data(pytester)
+    [last] = data["tests"]["test_test_reports_released_when_finished.py::test_last"]
+    live_reports = int(re.search(r"live reports: (\d+)", last["log"]).group(1))
+    # with a batch hook, the reports of the rows waiting for it are kept
+    assert_that(live_reports).is_less_than_or_equal_to(
+        _FINISHED_TESTS_BATCH if batch_hook else 1
+    )
+
+    results = data["tests"]["test_test_reports_released_when_finished.py::test_rerun"]
+    assert_that([result["result"] for result in results]).is_equal_to(
+        ["Rerun", "Rerun", "Failed"]
+    )
+
+
+def test_rerun_extras_scoped_to_attempt(pytester):
+    pytester.makeconftest(
+        """
+        import pytest
+        from pytest_html import extras
+
+        # the same extra is attached to every attempt
+        BASELINE = extras.text("baseline")
+
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_runtest_makereport(item, call):
+            outcome = yield
+            report = outcome.get_result()
+            if report.when == "call":
+                report.extras = [BASELINE, extras.json({"attempt": item.execution_count})]
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.flaky(reruns=2)
+        def test_rerun():
+            assert False
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(failed=1)
+
+    data = get_data(pytester)
+    results = data["tests"]["test_rerun_extras_scoped_to_attempt.py::test_rerun"]
+    assert_that(results).is_length(3)
+    for attempt, result in enumerate(results, start=1):
+        baseline, details = result["extras"]
+        assert_that(
+            pytester.path.joinpath(baseline["content"]).read_text()
+        ).is_equal_to("baseline")
+        assert_that(
+            json.loads(pytester.path.joinpath(details["content"]).read_text())
+        ).is_equal_to({"attempt": attempt})
+
+
+def test_content_addressed_assets(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        content_addressed_assets = true
+    """
+    )
+    pytester.makeconftest(
+        """
+        import pytest
+        from pytest_html import extras
+
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_runtest_makereport(item, call):
+            outcome = yield
+            report = outcome.get_result()
+            if report.when == "call":
+                report.extras = [
+                    extras.text("baseline"),
+                    extras.json({"index": item.callspec.params["index"]}),
+                ]
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("index", range(5))
+        def test_param(index):
+            pass
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=5)
+
+    data = get_data(pytester)
+    baselines = set()
+    for index in range(5):
+        baseline, details = data["tests"][
+            f"test_content_addressed_assets.py::test_param[{index}]"
+        ][0]["extras"]
+        baselines.add(baseline["content"])
+        assert_that(
+            json.loads(pytester.path.joinpath(details["content"]).read_text())
+        ).is_equal_to({"index": index})
+    assert_that(baselines).is_length(1)
+    baseline = pytester.path.joinpath(baselines.pop())
+    assert_that(baseline.name).is_equal_to(
+        f"{hashlib.sha256(b'baseline').hexdigest()}.txt"
+    )
+    assets = pytester.path.joinpath("assets")
+    assert_that(list(assets.glob("*.txt"))).is_length(1)
+    assert_that(list(assets.glob("*.json"))).is_length(5)
+
+
+def test_asset_write_threads(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        asset_write_threads = 2
+    """
+    )
+    pytester.makeconftest(
+        """
+        import pytest
+        from pytest_html import extras
+
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_runtest_makereport(item, call):
+            outcome = yield
+            report = outcome.get_result()
+            if report.when == "call":
+                report.extras = [extras.text(item.name), extras.json([item.name])]
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("index", range(20))
+        def test_param(index):
+            pass
+    """
+    )
+    # a directory in the way of an asset makes writing it fail
+    pytester.path.joinpath(
+        "assets", "test_asset_write_threads.py__test_param_0__0_0.txt"
+    ).mkdir(parents=True)
+    result = run(pytester)
+    result.assert_outcomes(passed=20)
+    result.stdout.fnmatch_lines(
+        ["*UserWarning: Failed to write the asset *test_param_0__0_0.txt*"]
+    )
+
+    data = get_data(pytester)
+    for index in range(1, 20):
+        name = f"test_param[{index}]"
+        text, details = data["tests"][f"test_asset_write_threads.py::{name}"][0][
+            "extras"
+        ]
+        assert_that(pytester.path.joinpath(text["content"]).read_text()).is_equal_to(
+            name
+        )
+        assert_that(
+            json.loads(pytester.path.joinpath(details["content"]).read_text())
+        ).is_equal_to([name])
+
+
+def test_columnar_report_data(pytester):
+    pytester.makeini(
+        """
+        [pytest]
+        columnar_report_data = true
+    """
+    )
+    pytester.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("index", range(10))
+        def test_param(index):
+            assert index % 5
+    """
+    )
+    result = run(pytester)
+    result.assert_outcomes(passed=8, failed=2)
+
+    data = get_data(pytester)
+    assert_that(data["tests"]).is_empty()
+    columnar = data["columnar"]
+    assert_that(columnar["rows"]).is_equal_to(10)
+    assert_that(columnar["fields"]["result"]["table"]).contains_only("Failed", "Passed")
+    assert_that(columnar["fields"]["result"]["codes"]).is_length(10)
+
+    def value(column, row):
+        if "table" in column:
+            return column["table"][column["codes"][row]]
+        return column["values"][row]
+
+    fields = columnar["fields"]
+    results = {
+        value(fields["testId"], row): (
+            value(fields["result"], row),
+            [value(column, row) for column in columnar["cells"]][0],
+        )
+        for row in range(columnar["rows"])
+    }
+    assert_that(results["test_columnar_report_data.py::test_param[0]"]).is_equal_to(
+        ("Failed", '<td class="col-result">Failed</td>')
+    )
+    assert_that(results["test_columnar_report_data.py::test_param[1]"]).is_equal_to(
+        ("Passed", '<td class="col-result">Passed</td>')
+    )
+
+
+def test_encode_columnar_keeps_values_and_missing_fields_apart():
+    column = _encode_column([True, 1, 1, 1, False, 0, True, 0])
+    assert_that(column["table"]).is_equal_to([True, 1, False, 0])
+    assert_that([type(value) for value in column["table"]]).is_equal_to(
+        [bool, int, bool, int]
+    )
+
+    columnar = _encode_columnar(
+        {
+            "test_a": [{"result": "Passed", "owner": None, "resultsTableRow": []}],
+            "test_b": [
+                {"result": "Passed", "resultsTableRow": []},
+                {"result": "Passed", "owner": "me", "resultsTableRow": []},
+            ],
+        }
+    )
+    assert_that(columnar["fields"]["owner"]["missing"]).is_equal_to([1])
+    assert_that(columnar["fields"]["owner"]["values"]).is_equal_to([None, None, "me"])
+    assert_that(columnar["fields"]["result"]).does_not_contain_key("missing", "present")
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("no escape codes", "no escape codes"),
+        (
+            "\x1b[1;31mbold red\x1b[0m plain",
+            '<span class="ansi1 ansi31">bold red</span> plain',
+        ),
+        ("\x1b[1m\x1b[22mnormal", "normal"),
+        ("\x1b[92mbright\x1b[39m", '<span class="ansi92">bright</span>'),
+        ("\x1b[38;5;100mindexed\x1b[m", '<span class="ansi38-100">indexed</span>'),
+        (
+            "\x1b[48;2;1;2;3mtrue color",
+            '<span class="ansi48-001002003">true color</span>',
+        ),
+        (
+            "\x1b[7minverted",
+            '<span class="inv_background inv_foreground">inverted</span>',
+        ),
+        ("\x1b[7;32minverted", '<span class="inv32 inv_foreground">inverted</span>'),
+        ("cursor\x1b[2K moved\x1b(B", "cursor moved"),
+    ],
+)
+def test_ansi_to_html(text, expected):
+    assert_that(_ansi_to_html(text)).is_equal_to(expected)
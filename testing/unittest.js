@@ -4,6 +4,8 @@ const { doInitFilter, doFilter } = require('../src/pytest_html/scripts/filter.js
 const { doInitSort, doSort } = require('../src/pytest_html/scripts/sort.js')
 const dataModule = require('../src/pytest_html/scripts/datamanager.js')
 const storageModule = require('../src/pytest_html/scripts/storage.js')
+const { ansiToHtml } = require('../src/pytest_html/scripts/ansi.js')
+const { decodeColumnar } = require('../src/pytest_html/scripts/dataloader.js')
 
 
 const setTestData = () => {
@@ -205,6 +207,23 @@ describe('Sort tests', () => {
                 'failed', 'passed', 'passed', 'passed', 'passed', 'passed',
             ])
         })
+        it('sort on duration', () => {
+            getSortMock = sinon.stub(storageModule, 'getSort').returns(null)
+            setSortMock = sinon.stub(storageModule, 'setSort')
+            getSortDirectionMock = sinon.stub(storageModule, 'getSortDirection').returns(null)
+            setSortDirection = sinon.stub(storageModule, 'setSortDirection')
+            managerSpy = sinon.spy(dataModule.manager, 'setRender')
+
+            // durations replaced by a plugin are only known as formatted strings
+            const durations = [2.5, '00:00:03', 0.0004, '120 ms', 0.05, 1.5]
+            dataModule.manager.testSubset.forEach((test, index) => test.duration = durations[index])
+
+            doSort('duration')
+            expect(managerSpy.callCount).to.eql(1)
+            expect(dataModule.manager.testSubset.map(({ id }) => id)).to.eql([
+                'test_2', 'test_4', 'test_3', 'test_5', 'test_0', 'test_1',
+            ])
+        })
     })
 })
 
@@ -278,3 +297,54 @@ describe('Storage tests', () => {
         })
     })
 })
+
+describe('ANSI tests', () => {
+    describe('ansiToHtml', () => {
+        const conversions = [
+            { text: 'no escape codes', expected: 'no escape codes' },
+            {
+                text: '\u001b[1;31mbold red\u001b[0m plain',
+                expected: '<span class="ansi1 ansi31">bold red</span> plain',
+            },
+            { text: '\u001b[92mbright\u001b[39m', expected: '<span class="ansi92">bright</span>' },
+            { text: '\u001b[38;5;100mindexed\u001b[m', expected: '<span class="ansi38-100">indexed</span>' },
+            { text: '\u001b[48;2;1;2;3mtrue color', expected: '<span class="ansi48-001002003">true color</span>' },
+            { text: '\u001b[7minverted', expected: '<span class="inv_background inv_foreground">inverted</span>' },
+            { text: 'cursor\u001b[2K moved', expected: 'cursor moved' },
+        ]
+        conversions.forEach(({ text, expected }, index) => {
+            it(`converts escape codes ${index + 1}`, () => {
+                expect(ansiToHtml(text)).to.eql(expected)
+            })
+        })
+    })
+})
+
+describe('Data loader tests', () => {
+    describe('decodeColumnar', () => {
+        it('rebuilds the results grouped by nodeid', () => {
+            const columnar = {
+                rows: 3,
+                fields: {
+                    nodeid: { values: ['test_a', 'test_b', 'test_b'] },
+                    result: { table: ['Passed', 'Rerun'], codes: [0, 1, 0] },
+                    fullLog: { table: [null, 'assets/log.txt'], codes: [0, 1, 0], present: [1] },
+                    owner: { values: [null, 'me', 'you'], missing: [2] },
+                },
+                cells: [
+                    { table: ['<td>Passed</td>', '<td>Rerun</td>'], codes: [0, 1, 0] },
+                    { values: ['<td>extra</td>', null, null] },
+                ],
+            }
+            expect(decodeColumnar(columnar)).to.eql({
+                'test_a': [
+                    { result: 'Passed', owner: null, resultsTableRow: ['<td>Passed</td>', '<td>extra</td>'] },
+                ],
+                'test_b': [
+                    { result: 'Rerun', fullLog: 'assets/log.txt', owner: 'me', resultsTableRow: ['<td>Rerun</td>'] },
+                    { result: 'Passed', resultsTableRow: ['<td>Passed</td>'] },
+                ],
+            })
+        })
+    })
+})